@@ -9,16 +9,29 @@ Nécessite: pip install requests beautifulsoup4 lxml pillow
 import json
 import os
 import sys
-import time
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from pathlib import Path
 
+from catalogue import CACHE_DIRNAME, CatalogueError, extract_asin_from_amazon_url, load_catalogue, slug_of
+from scrape_guard import (
+    BLOCKING_KINDS,
+    CIRCUIT_OPEN,
+    OPENLIBRARY_COVER_URL,
+    STATE_FILENAME,
+    ScrapeGuard,
+    classify_exception,
+    classify_response,
+)
+
 # Configuration
 BASE_DIR = Path(__file__).parent.parent
 JSON_PATH = BASE_DIR / "data" / "bibliotheque.json"
 IMG_DIR = BASE_DIR / "img" / "books"
+STATE_PATH = BASE_DIR / "data" / CACHE_DIRNAME / STATE_FILENAME
+# Délai minimal entre deux pages Amazon ; augmenté automatiquement en cas de blocage
+REQUEST_DELAY = 2.0
 
 # Headers pour simuler un navigateur
 HEADERS = {
@@ -34,23 +47,33 @@ HEADERS = {
 def load_books():
     """Charge la liste des livres depuis le fichier JSON"""
     try:
-        with open(JSON_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('livres', [])
+        return load_catalogue(JSON_PATH).books
     except FileNotFoundError:
         print(f"❌ Fichier non trouvé: {JSON_PATH}")
         sys.exit(1)
-    except json.JSONDecodeError as e:
+    except CatalogueError as e:
         print(f"❌ Erreur de lecture JSON: {e}")
         sys.exit(1)
 
-def get_cover_url_from_amazon(url, expected_title, expected_author):
+def blocked_code(kind):
+    """Code d'erreur d'une page Amazon bloquée (captcha, 503, image vide, ...)"""
+    return f"BLOQUE_{kind.upper()}"
+
+def get_cover_url_from_amazon(url, expected_title, expected_author, guard=None):
     """
     Scrape la page Amazon pour récupérer l'URL de la couverture
     Vérifie la cohérence du livre avec le titre et l'auteur attendus
+    Si un ScrapeGuard est fourni, le classement de la réponse y est enregistré
     """
     try:
         response = requests.get(url, headers=HEADERS, timeout=10)
+
+        # Une page captcha ou un 503 n'est pas une erreur du livre : ne pas vérifier titre/auteur
+        kind = classify_response(response.status_code, response.text)
+        if guard is not None and guard.record(url, kind):
+            print(f"  ⛔ Amazon bloque les requêtes, pause jusqu'à {guard.open_until(url)}")
+        if kind in BLOCKING_KINDS:
+            return None, blocked_code(kind)
         response.raise_for_status()
 
         soup = BeautifulSoup(response.content, 'lxml')
@@ -168,7 +191,13 @@ def get_cover_url_from_amazon(url, expected_title, expected_author):
 
     except requests.RequestException as e:
         print(f"  ⚠️  Erreur de requête: {e}")
-        return None, "ERREUR_RESEAU"
+        if isinstance(e, requests.HTTPError):
+            # 404 & co : déjà classés plus haut, ce n'est pas un blocage
+            return None, "ERREUR_RESEAU"
+        kind = classify_exception(e)
+        if guard is not None and guard.record(url, kind):
+            print(f"  ⛔ Amazon ne répond plus, pause jusqu'à {guard.open_until(url)}")
+        return None, blocked_code(kind)
     except Exception as e:
         print(f"  ⚠️  Erreur inattendue: {e}")
         return None, "ERREUR_INCONNUE"
@@ -188,6 +217,18 @@ def download_image(url, output_path):
         print(f"  ❌ Échec du téléchargement: {e}")
         return False
 
+def download_openlibrary(url_amazon, output_path, guard=None):
+    """Fallback : couverture OpenLibrary d'après l'ISBN-10 (= ASIN des livres papier)"""
+    isbn = extract_asin_from_amazon_url(url_amazon)
+    if not isbn:
+        return False
+    print(f"  ↪️  Fallback OpenLibrary (ISBN {isbn})")
+    cover_url = OPENLIBRARY_COVER_URL.format(isbn=isbn)
+    if guard is not None:
+        # Quand Amazon bloque, chaque livre passe par OpenLibrary : même espacement que pour Amazon
+        guard.pace(cover_url)
+    return download_image(cover_url, output_path)
+
 def main():
     print("🔍 Scraping des couvertures Amazon.fr...\n")
 
@@ -198,81 +239,103 @@ def main():
     books = load_books()
     print(f"📚 {len(books)} livres trouvés dans {JSON_PATH}\n")
 
+    # Disjoncteur Amazon + file des livres bloqués, partagés avec fetch_book_covers.py
+    guard = ScrapeGuard(STATE_PATH, base_delay=REQUEST_DELAY)
+
     success_count = 0
     skip_count = 0
     fail_count = 0
     error_count = 0
+    queued_count = 0
     errors = []
 
-    for i, book in enumerate(books, 1):
-        titre = book.get('titre', 'Sans titre')
-        auteur = book.get('auteur', 'Auteur inconnu')
-        image = book.get('image', '')
-        url_amazon = book.get('url_amazon', '')
-
-        if not url_amazon:
-            print(f"{i}. ⏭️  {titre} - Pas d'URL Amazon")
-            skip_count += 1
-            continue
-
-        # Extraire le nom du fichier depuis le champ image
-        if image:
-            filename = Path(image).name
-            output_path = IMG_DIR / filename
-        else:
-            print(f"{i}. ⚠️  {titre} - Pas de nom de fichier image défini")
-            skip_count += 1
-            continue
-
-        # Vérifier si l'image existe déjà
-        if output_path.exists():
-            file_size = output_path.stat().st_size
-            # Si le fichier fait plus de 5KB, on considère qu'il est valide
-            if file_size > 5000:
-                print(f"{i}. ✓ {titre} - Image déjà présente ({file_size // 1024}KB)")
-                success_count += 1
+    try:
+        for i, book in enumerate(books, 1):
+            titre = book.get('titre', 'Sans titre')
+            auteur = book.get('auteur', 'Auteur inconnu')
+            image = book.get('image', '')
+            url_amazon = book.get('url_amazon', '')
+
+            if not url_amazon:
+                print(f"{i}. ⏭️  {titre} - Pas d'URL Amazon")
+                skip_count += 1
+                continue
+
+            # Extraire le nom du fichier depuis le champ image
+            if image:
+                filename = Path(image).name
+                output_path = IMG_DIR / filename
+            else:
+                print(f"{i}. ⚠️  {titre} - Pas de nom de fichier image défini")
+                skip_count += 1
                 continue
+
+            # Vérifier si l'image existe déjà
+            if output_path.exists():
+                file_size = output_path.stat().st_size
+                # Si le fichier fait plus de 5KB, on considère qu'il est valide
+                if file_size > 5000:
+                    print(f"{i}. ✓ {titre} - Image déjà présente ({file_size // 1024}KB)")
+                    success_count += 1
+                    guard.dequeue(slug_of(book))
+                    continue
+                else:
+                    print(f"{i}. 🔄 {titre} - Image trop petite ({file_size}B), re-téléchargement...")
+
+            print(f"{i}. 📥 {titre}")
+            print(f"    Auteur: {auteur}")
+            print(f"    URL: {url_amazon}")
+
+            # Scraper l'URL de la couverture avec vérification (sauf si le disjoncteur Amazon est ouvert)
+            if guard.allow(url_amazon):
+                guard.pace(url_amazon)
+                cover_url, error_code = get_cover_url_from_amazon(url_amazon, titre, auteur, guard)
             else:
-                print(f"{i}. 🔄 {titre} - Image trop petite ({file_size}B), re-téléchargement...")
-
-        print(f"{i}. 📥 {titre}")
-        print(f"    Auteur: {auteur}")
-        print(f"    URL: {url_amazon}")
-
-        # Scraper l'URL de la couverture avec vérification
-        cover_url, error_code = get_cover_url_from_amazon(url_amazon, titre, auteur)
-
-        if error_code:
-            print(f"  ❌ Erreur: {error_code}")
-            errors.append({
-                'titre': titre,
-                'auteur': auteur,
-                'url': url_amazon,
-                'erreur': error_code
-            })
-            error_count += 1
-            fail_count += 1
-            time.sleep(2)
-            continue
+                cover_url, error_code = None, blocked_code(CIRCUIT_OPEN)
+
+            if error_code and error_code.startswith("BLOQUE_"):
+                # Amazon bloque : ce n'est pas une erreur de cohérence, on tente OpenLibrary ou on remet à plus tard
+                if download_openlibrary(url_amazon, output_path, guard):
+                    file_size = output_path.stat().st_size
+                    print(f"  ✅ Téléchargé (OpenLibrary): {filename} ({file_size // 1024}KB)")
+                    success_count += 1
+                    guard.dequeue(slug_of(book))
+                else:
+                    print(f"  ⏸️  Amazon bloqué ({error_code}), mis en file pour un prochain passage")
+                    reason = error_code.removeprefix("BLOQUE_").lower()
+                    guard.enqueue(slug_of(book), title=titre, url=url_amazon, reason=reason)
+                    queued_count += 1
+                continue
 
-        if not cover_url:
-            print(f"  ❌ Impossible de trouver l'image de couverture")
-            fail_count += 1
-            time.sleep(2)
-            continue
+            if error_code:
+                print(f"  ❌ Erreur: {error_code}")
+                errors.append({
+                    'titre': titre,
+                    'auteur': auteur,
+                    'url': url_amazon,
+                    'erreur': error_code
+                })
+                error_count += 1
+                fail_count += 1
+                continue
 
-        print(f"    Image trouvée: {cover_url[:80]}...")
+            if not cover_url:
+                print(f"  ❌ Impossible de trouver l'image de couverture")
+                fail_count += 1
+                continue
 
-        # Télécharger l'image
-        if download_image(cover_url, output_path):
-            file_size = output_path.stat().st_size
-            print(f"  ✅ Téléchargé: {filename} ({file_size // 1024}KB)")
-            success_count += 1
-        else:
-            fail_count += 1
+            print(f"    Image trouvée: {cover_url[:80]}...")
 
-        # Délai entre les requêtes pour ne pas surcharger Amazon
-        time.sleep(2)
+            # Télécharger l'image
+            if download_image(cover_url, output_path):
+                file_size = output_path.stat().st_size
+                print(f"  ✅ Téléchargé: {filename} ({file_size // 1024}KB)")
+                success_count += 1
+                guard.dequeue(slug_of(book))
+            else:
+                fail_count += 1
+    finally:
+        guard.save()
 
     print("\n" + "="*60)
     print(f"📊 Résumé:")
@@ -281,6 +344,8 @@ def main():
     print(f"  ❌ Échecs: {fail_count}")
     if error_count > 0:
         print(f"  ⚠️  Erreurs de cohérence: {error_count}")
+    if queued_count > 0:
+        print(f"  ⏸️  En file (Amazon bloqué): {queued_count} - relancer le script plus tard")
     print(f"  📁 Images dans: {IMG_DIR}")
     print("="*60)
 
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Construction incrémentale des pages détail `pages/<bd>` à partir du catalogue.
+
+Chaque page dépend du gabarit `scripts/book-detail-template.html` (partagé avec
+generate-book-detail-pages.mjs) et des champs du livre qu'il utilise (`bd`,
+`titre`, `resume_court`) ; le reste de la fiche est lu côté navigateur dans
+`data/bibliotheque.json`. La couverture est suivie comme livrable du livre : un
+changement d'image n'a pas à réécrire la page, mais doit être redéployé.
+
+Le graphe de build (`data/.cache/pages_graph.json`) garde, par page, le hash de
+chaque entrée et du HTML produit. Un nouveau passage ne réécrit que les pages
+dont une entrée a changé (en parallèle, `--jobs`) et liste dans `changed` les
+pages et images différentes du build précédent, pour que le déploiement
+n'envoie qu'elles (`--changed-list` les écrit aussi une par ligne).
+
+Une page modifiée à la main (contenu différent du dernier build, ou du gabarit
+au premier passage) est considérée comme personnalisée et n'est jamais
+réécrite, sauf avec `--force`.
+
+Usage:
+  python3 scripts/build_book_pages.py
+  python3 scripts/build_book_pages.py --dry-run
+  python3 scripts/build_book_pages.py --changed-list /tmp/deploy.txt
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from catalogue import CACHE_DIRNAME, CatalogueError, load_catalogue
+
+
+GRAPH_VERSION = 1
+GRAPH_FILENAME = "pages_graph.json"
+TEMPLATE_FIELDS = ("bd", "titre", "resume_court")
+
+# Résultats d'un passage pour une page
+BUILT = "construite"
+UNCHANGED = "inchangée"
+CUSTOM = "personnalisée"
+
+
+@dataclass
+class PageNode:
+    page: str
+    record: str
+    template: str
+    output: str
+    cover: str = ""
+    cover_sha: str = ""
+    custom: bool = False
+
+
+def escape_html(text: str) -> str:
+    # Même échappement que escapeHtml() dans generate-book-detail-pages.mjs.
+    return str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def render_page(template: str, book: dict) -> str:
+    titre = str(book.get("titre") or "")
+    description = book.get("resume_court") or f"Présentation du livre {titre}."
+    return (
+        template.replace("{{titre}}", escape_html(titre))
+        .replace("{{description}}", escape_html(description))
+        .replace("{{bd}}", escape_html(str(book.get("bd") or "")))
+    )
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    try:
+        return sha256_bytes(path.read_bytes())
+    except OSError:
+        return ""
+
+
+def record_hash(book: dict) -> str:
+    fields = {name: book.get(name) for name in TEMPLATE_FIELDS}
+    return sha256_bytes(json.dumps(fields, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+
+
+def build_page(
+    book: dict,
+    prev: dict | None,
+    *,
+    template: str,
+    template_sha: str,
+    root: Path,
+    pages_dir: Path,
+    force: bool,
+    dry_run: bool,
+) -> tuple[PageNode, str]:
+    page_path = pages_dir / str(book["bd"])
+    cover_path = (pages_dir / str(book.get("image") or "")).resolve() if book.get("image") else None
+    node = PageNode(
+        page=page_path.relative_to(root).as_posix(),
+        record=record_hash(book),
+        template=template_sha,
+        output=sha256_file(page_path),
+        cover=cover_path.relative_to(root).as_posix() if cover_path and cover_path.is_relative_to(root) else "",
+        cover_sha=sha256_file(cover_path) if cover_path else "",
+    )
+
+    if prev and not force and node.output and node.output == prev.get("output"):
+        if prev.get("custom"):
+            node.custom = True
+            return node, CUSTOM
+        if (prev.get("record"), prev.get("template")) == (node.record, node.template):
+            return node, UNCHANGED
+
+    html = render_page(template, book)
+    out_sha = sha256_bytes(html.encode("utf-8"))
+    if node.output == out_sha:
+        return node, UNCHANGED
+    # Page existante qui ne vient pas du dernier build : modifiée à la main.
+    edited = node.output and (prev is None or prev.get("custom") or node.output != prev.get("output"))
+    if edited and not force:
+        node.custom = True
+        return node, CUSTOM
+
+    if not dry_run:
+        page_path.write_text(html, encoding="utf-8")
+    node.output = out_sha
+    return node, BUILT
+
+
+def load_graph(path: Path) -> dict:
+    try:
+        graph = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return graph if graph.get("version") == GRAPH_VERSION else {}
+
+
+def save_graph(graph: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(graph, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+def changed_files(prev_pages: dict[str, dict], nodes: list[PageNode]) -> list[str]:
+    """Pages et couvertures dont le contenu diffère du build précédent."""
+    prev_by_page = {p.get("page"): p for p in prev_pages.values()}
+    prev_covers = {p.get("cover"): p.get("cover_sha") for p in prev_pages.values() if p.get("cover")}
+    out: list[str] = []
+    for node in nodes:
+        if node.output and node.output != (prev_by_page.get(node.page) or {}).get("output"):
+            out.append(node.page)
+        if node.cover and node.cover_sha and node.cover_sha != prev_covers.get(node.cover):
+            out.append(node.cover)
+    return list(dict.fromkeys(out))
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        description="Reconstruit uniquement les pages détail dont les entrées ont changé."
+    )
+    parser.add_argument("--data", default="data/bibliotheque.json", help="Chemin vers le JSON de la bibliothèque.")
+    parser.add_argument("--pages", default="pages", help="Dossier des pages (défaut: pages)")
+    parser.add_argument("--template", default="scripts/book-detail-template.html", help="Gabarit des pages détail")
+    parser.add_argument(
+        "--graph", default=None, help=f"Graphe de build (défaut: data/{CACHE_DIRNAME}/{GRAPH_FILENAME})"
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4, help="Pages traitées en parallèle")
+    parser.add_argument("--force", action="store_true", help="Réécrit toutes les pages, même personnalisées")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche ce qui serait reconstruit sans rien écrire")
+    parser.add_argument("--changed-list", default=None, help="Écrit les fichiers à déployer, un par ligne")
+    args = parser.parse_args(argv)
+
+    data_path = Path(args.data)
+    pages_dir = Path(args.pages).resolve()
+    template_path = Path(args.template)
+    for path in (data_path, pages_dir, template_path):
+        if not path.exists():
+            print(f"Erreur: fichier introuvable: {path}", file=sys.stderr)
+            return 2
+    root = data_path.resolve().parent.parent
+    graph_path = Path(args.graph) if args.graph else data_path.parent / CACHE_DIRNAME / GRAPH_FILENAME
+
+    try:
+        books = load_catalogue(data_path).books
+    except CatalogueError as e:
+        print(f"Erreur: {data_path}: {e}", file=sys.stderr)
+        return 2
+
+    template = template_path.read_text(encoding="utf-8")
+    template_sha = sha256_bytes(template.encode("utf-8"))
+    prev_graph = load_graph(graph_path)
+    prev_pages: dict[str, dict] = prev_graph.get("pages") or {}
+
+    def one(book: dict) -> tuple[PageNode, str]:
+        return build_page(
+            book,
+            prev_pages.get(str(book["bd"])),
+            template=template,
+            template_sha=template_sha,
+            root=root,
+            pages_dir=pages_dir,
+            force=args.force,
+            dry_run=args.dry_run,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(one, books))
+
+    counts: dict[str, int] = {}
+    for node, action in results:
+        counts[action] = counts.get(action, 0) + 1
+        if action != UNCHANGED:
+            print(f"[{action}] {node.page}")
+        if not node.cover_sha:
+            print(f"[couverture manquante] {node.page}: {node.cover or '(champ image vide)'}")
+
+    nodes = [node for node, _ in results]
+    current = {str(b["bd"]) for b in books}
+    removed = sorted(str(p.get("page")) for bd, p in prev_pages.items() if bd not in current)
+    changed = changed_files(prev_pages, nodes)
+    for page in removed:
+        print(f"[retirée du catalogue] {page}")
+
+    summary = ", ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    print(f"{len(books)} pages ({summary}) ; {len(changed)} fichier(s) à déployer")
+    if args.dry_run:
+        return 0
+
+    save_graph(
+        {
+            "version": GRAPH_VERSION,
+            "built_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "template": {"path": template_path.as_posix(), "sha256": template_sha},
+            "pages": {str(b["bd"]): asdict(node) for b, node in zip(books, nodes)},
+            "changed": changed,
+            "removed": removed,
+        },
+        graph_path,
+    )
+    if args.changed_list:
+        Path(args.changed_list).write_text("".join(f"{p}\n" for p in changed), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
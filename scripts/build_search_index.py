@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Construit un index de recherche statique pour la bibliothèque (un par langue).
+
+Le site filtrait jusqu'ici tout `data/bibliotheque.json` côté navigateur à chaque
+frappe. Ce script précalcule un index inversé par préfixe, découpé en shards selon
+le début de chaque terme, pour que la page ne charge que le shard utile :
+
+  data/search/<lang>/meta.json   liste des livres (`bd`), score de chaque rang et table des shards
+  data/search/<lang>/<clé>.json  {"terms": [...triés], "postings": [[doc, rang, doc, rang, ...], ...],
+                                  "exact": {terme: [doc, rang, ...]}}
+
+Les termes sont normalisés (minuscules, accents et ligatures retirés : « stratégie »
+-> « strategie », « cœur » -> « coeur »). Côté client, pour chaque mot saisi :
+normaliser, charger le shard `mot[:prefix_len]`, chercher par dichotomie les termes
+qui commencent par le mot (plus `exact[mot]` pour un champ égal au mot) et garder pour
+chaque livre le plus petit rang ; son score est `meta.scores[rang]`. Un livre doit
+correspondre à tous les mots ; le score final est la somme. Le résultat est celui de
+`searchBook()` dans assets/main.js, à la normalisation près (searchBook() ne retire ni
+les accents ni les ligatures et ne coupe pas sur l'apostrophe typographique) ; l'index
+en anglais cherche aussi les tags et la catégorie traduits (TAG_TRANSLATIONS,
+CATEGORY_TRANSLATIONS, lus dans ce même fichier).
+
+Usage:
+  python3 scripts/build_search_index.py
+  python3 scripts/build_search_index.py --query "cygne noir" --lang fr
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import json
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+from catalogue import CatalogueError, load_catalogue
+
+
+INDEX_VERSION = 2
+TERM_RE = re.compile(r"[a-z0-9]+")
+# NFD leaves ligatures whole; without this TERM_RE would split « cœur » into « c » + « ur ».
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+# Fields, in order, and scores of searchBook() in assets/main.js. For each word it scores the
+# first field that matches: title/author 100 (the whole field is the word), 50 (the field
+# starts with it) or 30 (a later word does), otherwise the other fields 20 / 10 / 5, and
+# title/author points count 10 times. Postings store the rank field * 3 + tier instead of a
+# score, so the smallest rank of a book is that first matching field with its best tier.
+PRIMARY_FIELDS = ("titre", "auteur")
+SECONDARY_FIELDS = ("resume_court", "resume_long", "tags", "tags_en", "categorie", "categorie_en")
+PRIMARY_WEIGHT = 10
+PRIMARY_SCORES = (100, 50, 30)  # exact, start, word-start
+SECONDARY_SCORES = (20, 10, 5)
+EXACT, START, WORD_START = range(3)
+SCORES = [x * PRIMARY_WEIGHT for _ in PRIMARY_FIELDS for x in PRIMARY_SCORES] + [
+    x for _ in SECONDARY_FIELDS for x in SECONDARY_SCORES
+]
+TRANSLATION_TABLES = ("TAG_TRANSLATIONS", "CATEGORY_TRANSLATIONS")
+
+
+def fold(text: str) -> str:
+    text = unicodedata.normalize("NFD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return text.lower().translate(LIGATURES).replace("’", "'")
+
+
+def terms_of(text: str) -> list[str]:
+    return TERM_RE.findall(fold(text))
+
+
+def field_values(book: dict, field: str) -> list[str]:
+    value = book.get(field)
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    return [str(value)] if value else []
+
+
+def shard_key(term: str, prefix_len: int) -> str:
+    return term[:prefix_len]
+
+
+def load_translations(main_js: Path) -> dict[str, dict[str, str]]:
+    """TAG_TRANSLATIONS and CATEGORY_TRANSLATIONS of assets/main.js (keys lowercased, like translateTag())."""
+    source = main_js.read_text(encoding="utf-8")
+    tables = {}
+    for name in TRANSLATION_TABLES:
+        m = re.search(r"const " + name + r" = \{(.*?)\n\};", source, flags=re.DOTALL)
+        if not m:
+            raise ValueError(f"{name} introuvable dans {main_js}")
+        pairs = re.findall(r'^\s*(?:"([^"]+)"|([\w-]+))\s*:\s*"([^"]*)"', m.group(1), flags=re.MULTILINE)
+        tables[name] = {(quoted or bare).strip().lower(): value for quoted, bare, value in pairs}
+    return tables
+
+
+def load_books(data_dir: Path, lang: str, translations: dict[str, dict[str, str]] | None = None) -> list[dict]:
+    books = load_catalogue(data_dir / "bibliotheque.json").books
+    if lang == "fr":
+        return books
+
+    # Translations only carry the text fields; authors, tags and category come from the French file
+    # and are searched both as-is and translated, like searchBook() does for lang === "en".
+    tr = load_catalogue(data_dir / f"bibliotheque.{lang}.json", kind="translation")
+    tags_tr = (translations or {}).get("TAG_TRANSLATIONS", {})
+    category_tr = (translations or {}).get("CATEGORY_TRANSLATIONS", {})
+    merged = []
+    for book in books:
+        tr_book = tr.by_slug(str(book.get("bd") or "")) or {}
+        book = {**book, **{k: v for k, v in tr_book.items() if v}}
+        book["tags_en"] = [tags_tr.get(str(t).strip().lower(), str(t)) for t in book.get("tags") or []]
+        category = str(book.get("categorie") or "")
+        book["categorie_en"] = category_tr.get(category.strip().lower(), category)
+        merged.append(book)
+    return merged
+
+
+def keep_first(postings: dict[str, dict[int, int]], term: str, doc: int, rank: int) -> None:
+    docs = postings.setdefault(term, {})
+    if rank < docs.get(doc, len(SCORES)):
+        docs[doc] = rank
+
+
+def build_postings(books: list[dict]) -> tuple[dict[str, dict[int, int]], dict[str, dict[int, int]]]:
+    """Prefix postings (any word starting with the term) and exact postings (a field equal to the term)."""
+    postings: dict[str, dict[int, int]] = {}
+    exact: dict[str, dict[int, int]] = {}
+    for doc, book in enumerate(books):
+        for position, field in enumerate(PRIMARY_FIELDS + SECONDARY_FIELDS):
+            for value in field_values(book, field):
+                terms = terms_of(value)
+                for pos, term in enumerate(terms):
+                    keep_first(postings, term, doc, position * 3 + (START if pos == 0 else WORD_START))
+                if len(terms) == 1 and fold(value).strip() == terms[0]:
+                    keep_first(exact, terms[0], doc, position * 3 + EXACT)
+    return postings, exact
+
+
+def flatten(docs: dict[int, int]) -> list[int]:
+    return [x for doc, s in sorted(docs.items()) for x in (doc, s)]
+
+
+def write_index(books: list[dict], out_dir: Path, *, lang: str, prefix_len: int, source_hash: str) -> dict:
+    postings, exact = build_postings(books)
+    shards: dict[str, list[str]] = {}
+    for term in sorted(postings):
+        shards.setdefault(shard_key(term, prefix_len), []).append(term)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("*.json"):
+        old.unlink()
+
+    shard_table = {}
+    for key, terms in shards.items():
+        payload = {
+            "terms": terms,
+            "postings": [flatten(postings[t]) for t in terms],
+            "exact": {t: flatten(exact[t]) for t in terms if t in exact},
+        }
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        (out_dir / f"{key}.json").write_text(body, encoding="utf-8")
+        shard_table[key] = {"file": f"{key}.json", "terms": len(terms), "bytes": len(body.encode("utf-8"))}
+
+    meta = {
+        "version": INDEX_VERSION,
+        "lang": lang,
+        "prefix_len": prefix_len,
+        "source_sha256": source_hash,
+        "docs": [str(b.get("bd") or "") for b in books],
+        "scores": SCORES,
+        "shards": shard_table,
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    return meta
+
+
+def lookup(index_dir: Path, query: str) -> list[tuple[str, int]]:
+    """Reference implementation of the client-side lookup (used by --query)."""
+    meta = json.loads((index_dir / "meta.json").read_text(encoding="utf-8"))
+    prefix_len = int(meta["prefix_len"])
+    cache: dict[str, dict] = {}
+    totals: dict[int, int] | None = None
+
+    for word in terms_of(query):
+        keys = [k for k in meta["shards"] if k.startswith(word[:prefix_len])]
+        first: dict[int, int] = {}
+        for key in keys:
+            if key not in cache:
+                cache[key] = json.loads((index_dir / meta["shards"][key]["file"]).read_text(encoding="utf-8"))
+            shard = cache[key]
+            terms = shard["terms"]
+            i = bisect.bisect_left(terms, word)
+            while i < len(terms) and terms[i].startswith(word):
+                flat = shard["postings"][i]
+                for doc, rank in zip(flat[::2], flat[1::2]):
+                    first[doc] = min(rank, first.get(doc, rank))
+                i += 1
+            flat = shard.get("exact", {}).get(word, [])
+            for doc, rank in zip(flat[::2], flat[1::2]):
+                first[doc] = min(rank, first.get(doc, rank))
+        best = {doc: meta["scores"][rank] for doc, rank in first.items()}
+        if totals is None:
+            totals = best
+        else:
+            totals = {doc: totals[doc] + s for doc, s in best.items() if doc in totals}
+        if not totals:
+            return []
+
+    ranked = sorted((totals or {}).items(), key=lambda kv: (-kv[1], kv[0]))
+    return [(meta["docs"][doc], s) for doc, s in ranked]
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Construit l'index de recherche statique de la bibliothèque.")
+    parser.add_argument("--data-dir", default="data", help="Dossier des JSON de la bibliothèque (défaut: data)")
+    parser.add_argument("--output", default="data/search", help="Dossier de sortie (défaut: data/search)")
+    parser.add_argument("--lang", action="append", choices=["fr", "en"], help="Langue(s) à indexer (défaut: fr et en)")
+    parser.add_argument(
+        "--prefix-len",
+        type=int,
+        default=1,
+        help="Longueur du préfixe qui choisit le shard ; 2 pour un gros catalogue (défaut: 1)",
+    )
+    parser.add_argument(
+        "--main-js", default="assets/main.js", help="Traductions des tags et catégories (défaut: assets/main.js)"
+    )
+    parser.add_argument("--query", default="", help="Après construction, affiche les résultats de cette recherche.")
+    args = parser.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    output = Path(args.output)
+    langs = args.lang or ["fr", "en"]
+    prefix_len = max(1, int(args.prefix_len))
+
+    for lang in langs:
+        src = data_dir / ("bibliotheque.json" if lang == "fr" else f"bibliotheque.{lang}.json")
+        if not src.exists():
+            print(f"Erreur: fichier introuvable: {src}", file=sys.stderr)
+            return 2
+        translations = None
+        if lang != "fr":
+            try:
+                translations = load_translations(Path(args.main_js))
+            except (OSError, ValueError) as e:
+                print(f"Erreur: {args.main_js}: {e}", file=sys.stderr)
+                return 2
+        try:
+            books = load_books(data_dir, lang, translations)
+        except CatalogueError as e:
+            print(f"Erreur: {src}: {e}", file=sys.stderr)
+            return 2
+
+        source_hash = hashlib.sha256(src.read_bytes()).hexdigest()
+        meta = write_index(books, output / lang, lang=lang, prefix_len=prefix_len, source_hash=source_hash)
+        total = sum(s["bytes"] for s in meta["shards"].values())
+        largest = max((s["bytes"] for s in meta["shards"].values()), default=0)
+        print(
+            f"[{lang}] {len(books)} livres, {sum(s['terms'] for s in meta['shards'].values())} termes, "
+            f"{len(meta['shards'])} shards ({total} octets, max {largest}) -> {output / lang}"
+        )
+
+        if args.query:
+            for bd, score in lookup(output / lang, args.query):
+                print(f"  {score:4d}  {bd}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
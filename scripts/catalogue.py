@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Chargement partagé du catalogue `data/bibliotheque*.json` pour les scripts Python.
+
+Le schéma est validé une seule fois, puis le catalogue et ses index (ASIN, slug,
+tag, catégorie) sont mis en cache dans `data/.cache/` sous forme d'un snapshot
+pickle, indexé par le SHA-256 du JSON : tant que le fichier ne change pas, les
+outils rechargent le snapshot au lieu de re-parser et re-valider le JSON.
+
+    from catalogue import load_catalogue
+    cat = load_catalogue("data/bibliotheque.json")
+    cat.by_asin("2251444769")
+
+Usage CLI (contrôle du fichier) :
+  python3 scripts/catalogue.py [data/bibliotheque.json] [--translation]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import pickle
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+SNAPSHOT_VERSION = 2
+CACHE_DIRNAME = ".cache"
+
+# Champs obligatoires selon le type de fichier (ceux dont dépend le chargement) ; les autres
+# champs connus sont typés. Un champ attendu mais vide n'est qu'un avertissement par livre :
+# chaque outil garde son propre traitement (couverture manquante, fiche incomplète…).
+REQUIRED_FIELDS = {
+    "catalogue": ("bd", "titre"),
+    "translation": ("bd", "titre"),
+}
+EXPECTED_FIELDS = {
+    "catalogue": ("auteur", "image", "categorie"),
+    "translation": (),
+}
+STRING_FIELDS = (
+    "titre",
+    "auteur",
+    "image",
+    "resume_court",
+    "resume_long",
+    "url_amazon",
+    "categorie",
+    "bd",
+    "url_wikipedia",
+)
+LIST_FIELDS = ("tags", "pourquoi_entrepreneur")
+
+
+class CatalogueError(ValueError):
+    pass
+
+
+def extract_asin_from_amazon_url(url: str) -> str | None:
+    m = re.search(r"/dp/([A-Z0-9]{10})", url)
+    if m:
+        return m.group(1)
+    m = re.search(r"/gp/product/([A-Z0-9]{10})", url)
+    if m:
+        return m.group(1)
+    return None
+
+
+def normalize_tag(tag: str) -> str:
+    return re.sub(r"\s+", " ", str(tag or "").strip().lower())
+
+
+def slug_of(book: dict) -> str:
+    return str(book.get("bd") or "").removesuffix(".html")
+
+
+@dataclass
+class Catalogue:
+    path: str
+    sha256: str
+    kind: str
+    books: list[dict]
+    # Les index stockent des positions dans `books`.
+    asin_index: dict[str, int] = field(default_factory=dict)
+    slug_index: dict[str, int] = field(default_factory=dict)
+    tag_index: dict[str, list[int]] = field(default_factory=dict)
+    category_index: dict[str, list[int]] = field(default_factory=dict)
+    warnings: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.books)
+
+    def __iter__(self):
+        return iter(self.books)
+
+    def by_asin(self, asin: str) -> dict | None:
+        i = self.asin_index.get(asin)
+        return self.books[i] if i is not None else None
+
+    def by_slug(self, slug: str) -> dict | None:
+        i = self.slug_index.get(slug.removesuffix(".html"))
+        return self.books[i] if i is not None else None
+
+    def with_tag(self, tag: str) -> list[dict]:
+        return [self.books[i] for i in self.tag_index.get(normalize_tag(tag), [])]
+
+    def in_category(self, category: str) -> list[dict]:
+        return [self.books[i] for i in self.category_index.get(str(category or "").strip().lower(), [])]
+
+
+def validate_books(raw: object, *, kind: str) -> tuple[list[dict], list[str]]:
+    """Livres du fichier et avertissements par livre ; CatalogueError si le fichier est inutilisable."""
+    if not isinstance(raw, dict) or not isinstance(raw.get("livres"), list):
+        raise CatalogueError("JSON inattendu (clé 'livres' manquante ou invalide).")
+
+    errors: list[str] = []
+    warnings: list[str] = []
+    seen_bd: dict[str, int] = {}
+    for i, book in enumerate(raw["livres"]):
+        where = f"livres[{i}]"
+        if not isinstance(book, dict):
+            errors.append(f"{where}: objet attendu")
+            continue
+        for name in REQUIRED_FIELDS[kind]:
+            if not str(book.get(name) or "").strip():
+                errors.append(f"{where}: champ '{name}' manquant")
+        for name in EXPECTED_FIELDS[kind]:
+            if not str(book.get(name) or "").strip():
+                warnings.append(f"{where} ({book.get('bd') or '?'}): champ '{name}' vide")
+        for name in STRING_FIELDS:
+            if name in book and not isinstance(book[name], str):
+                errors.append(f"{where}: '{name}' doit être une chaîne")
+        for name in LIST_FIELDS:
+            if name in book and not (
+                isinstance(book[name], list) and all(isinstance(v, str) for v in book[name])
+            ):
+                errors.append(f"{where}: '{name}' doit être une liste de chaînes")
+        bd = str(book.get("bd") or "")
+        if bd:
+            if bd in seen_bd:
+                errors.append(f"{where}: 'bd' en double ({bd}, déjà livres[{seen_bd[bd]}])")
+            seen_bd.setdefault(bd, i)
+
+    if errors:
+        raise CatalogueError("; ".join(errors[:20]) + (f" (+{len(errors) - 20})" if len(errors) > 20 else ""))
+    return raw["livres"], warnings
+
+
+def build_catalogue(path: Path, data: bytes, *, kind: str) -> Catalogue:
+    try:
+        raw = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CatalogueError(f"JSON illisible: {e}") from e
+    books, warnings = validate_books(raw, kind=kind)
+
+    cat = Catalogue(
+        path=str(path), sha256=hashlib.sha256(data).hexdigest(), kind=kind, books=books, warnings=warnings
+    )
+    for i, book in enumerate(books):
+        asin = extract_asin_from_amazon_url(str(book.get("url_amazon") or ""))
+        if asin:
+            cat.asin_index.setdefault(asin, i)
+        slug = slug_of(book)
+        if slug:
+            cat.slug_index.setdefault(slug, i)
+        for tag in dict.fromkeys(normalize_tag(t) for t in book.get("tags") or []):
+            if tag:
+                cat.tag_index.setdefault(tag, []).append(i)
+        category = str(book.get("categorie") or "").strip().lower()
+        if category:
+            cat.category_index.setdefault(category, []).append(i)
+    return cat
+
+
+def snapshot_path(path: Path, digest: str) -> Path:
+    return path.parent / CACHE_DIRNAME / f"{path.stem}.{digest[:16]}.pickle"
+
+
+def load_catalogue(path: str | Path, *, kind: str = "catalogue", use_cache: bool = True) -> Catalogue:
+    """Charge et valide un fichier du catalogue, en passant par le snapshot si possible.
+
+    Lève FileNotFoundError si le fichier n'existe pas, CatalogueError s'il est invalide.
+    """
+    if kind not in REQUIRED_FIELDS:
+        raise ValueError(f"type de catalogue inconnu: {kind}")
+    path = Path(path)
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    snap = snapshot_path(path, digest)
+
+    if use_cache and snap.exists():
+        try:
+            with snap.open("rb") as f:
+                version, fields = pickle.load(f)
+            if version == SNAPSHOT_VERSION and fields["sha256"] == digest and fields["kind"] == kind:
+                return Catalogue(**{**fields, "path": str(path)})
+        except Exception:
+            pass  # snapshot illisible ou d'une autre version : on le reconstruit
+
+    cat = build_catalogue(path, data, kind=kind)
+    if use_cache:
+        try:
+            snap.parent.mkdir(parents=True, exist_ok=True)
+            for old in snap.parent.glob(f"{path.stem}.{'[0-9a-f]' * 16}.pickle"):
+                old.unlink()
+            tmp = snap.with_suffix(".tmp")
+            with tmp.open("wb") as f:
+                # Données brutes seulement, pour ne pas dépendre du nom du module au chargement.
+                pickle.dump((SNAPSHOT_VERSION, vars(cat)), f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(snap)
+        except OSError:
+            pass  # cache en lecture seule : on continue sans snapshot
+    return cat
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Valide un fichier du catalogue et affiche ses index.")
+    parser.add_argument("path", nargs="?", default="data/bibliotheque.json")
+    parser.add_argument("--translation", action="store_true", help="Fichier de traduction (ex. bibliotheque.en.json)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore et ne crée pas le snapshot")
+    args = parser.parse_args(argv)
+
+    try:
+        cat = load_catalogue(
+            args.path, kind="translation" if args.translation else "catalogue", use_cache=not args.no_cache
+        )
+    except FileNotFoundError:
+        print(f"Erreur: fichier introuvable: {args.path}", file=sys.stderr)
+        return 2
+    except CatalogueError as e:
+        print(f"Erreur: {args.path}: {e}", file=sys.stderr)
+        return 1
+
+    for warning in cat.warnings:
+        print(f"Avertissement: {warning}", file=sys.stderr)
+    print(
+        f"{cat.path}: {len(cat)} livres, {len(cat.asin_index)} ASIN, {len(cat.slug_index)} slugs, "
+        f"{len(cat.tag_index)} tags, {len(cat.category_index)} catégories"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Vérifie les liens du catalogue (`url_amazon`, `url_wikipedia`) en parallèle.
+
+Chaque URL est testée en HEAD, puis en GET si le serveur refuse le HEAD ou
+répond en erreur. La concurrence est limitée par hôte (`--per-host`) et les
+réponses Amazon passent par le disjoncteur de scrape_guard.py : une page captcha
+ou un 503 est signalé « bloqué », jamais « mort », et n'est pas mis en cache.
+
+Les résultats (statut, URL finale, date) sont gardés dans
+`data/.cache/links.json` ; un lien n'est revérifié qu'une fois son entrée plus
+vieille que `--ttl-hours`, si bien qu'un passage nocturne ne teste que le reste.
+
+`--fix-amazon` réécrit les `url_amazon` sous la forme canonique
+`https://www.amazon.fr/dp/<ASIN>` (sans requête réseau).
+
+Usage:
+  python3 scripts/check_links.py
+  python3 scripts/check_links.py --ttl-hours 0 --report links_report.json
+  python3 scripts/check_links.py --fix-amazon
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+from catalogue import CACHE_DIRNAME, CatalogueError, extract_asin_from_amazon_url, load_catalogue, slug_of
+from scrape_guard import (
+    BLOCKING_KINDS,
+    CIRCUIT_OPEN,
+    OK,
+    ScrapeGuard,
+    classify_exception,
+    classify_response,
+    host_of,
+    now_iso,
+)
+
+
+CACHE_FILENAME = "links.json"
+LINK_FIELDS = ("url_amazon", "url_wikipedia")
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+# Codes pour lesquels un HEAD ne dit rien de fiable : on refait la requête en GET.
+HEAD_FALLBACK_STATUSES = frozenset({400, 403, 405, 429, 500, 501, 503})
+DEAD_STATUSES = frozenset({404, 410})
+GET_READ_BYTES = 200_000
+
+# Verdicts du rapport
+ALIVE = "ok"
+REDIRECT = "redirection"
+DEAD = "mort"
+ERROR = "erreur"
+BLOCKED = "bloqué"
+
+
+@dataclass
+class LinkResult:
+    url: str
+    verdict: str
+    status: int | None
+    final_url: str
+    checked_at: str
+    detail: str = ""
+    # Issue pour le disjoncteur (OK, blocage, timeout, réseau) ; tout sauf OK est retenté au prochain passage.
+    kind: str = OK
+
+
+def is_stale(entry: dict, ttl_s: float) -> bool:
+    try:
+        checked = datetime.fromisoformat(str(entry["checked_at"]))
+    except (KeyError, ValueError):
+        return True
+    return (datetime.now(timezone.utc) - checked).total_seconds() > ttl_s
+
+
+def canonical_amazon_url(url: str) -> str:
+    asin = extract_asin_from_amazon_url(url)
+    if not asin:
+        return url
+    parts = urlparse(url)
+    return f"{parts.scheme or 'https'}://{parts.netloc or 'www.amazon.fr'}/dp/{asin}"
+
+
+def same_url(a: str, b: str) -> bool:
+    return a.rstrip("/") == b.rstrip("/")
+
+
+def request(url: str, method: str, *, user_agent: str, timeout_s: float) -> tuple[int, str, str]:
+    """(statut, URL finale après redirections, début du corps en GET) ; lève URLError/TimeoutError."""
+    req = urllib.request.Request(
+        url,
+        method=method,
+        headers={
+            "User-Agent": user_agent,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
+        },
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout_s) as resp:
+            body = resp.read(GET_READ_BYTES) if method == "GET" else b""
+            return resp.status, resp.geturl(), body.decode("utf-8", "ignore")
+    except urllib.error.HTTPError as e:
+        body = e.read(GET_READ_BYTES) if method == "GET" else b""
+        return e.code, e.geturl() or url, body.decode("utf-8", "ignore")
+
+
+def check_url(url: str, *, user_agent: str, timeout_s: float) -> LinkResult:
+    body = ""
+    try:
+        status, final_url, _ = request(url, "HEAD", user_agent=user_agent, timeout_s=timeout_s)
+        if status in HEAD_FALLBACK_STATUSES:
+            status, final_url, body = request(url, "GET", user_agent=user_agent, timeout_s=timeout_s)
+    except (urllib.error.URLError, TimeoutError, OSError) as e:
+        kind = classify_exception(e)
+        return LinkResult(url, ERROR, None, url, now_iso(), detail=f"{kind}: {e}", kind=kind)
+
+    kind = classify_response(status, body)
+    if kind in BLOCKING_KINDS:
+        return LinkResult(url, BLOCKED, status, final_url, now_iso(), detail=kind, kind=kind)
+    if status in DEAD_STATUSES:
+        verdict = DEAD
+    elif status >= 400:
+        verdict = ERROR
+    elif not same_url(final_url, url):
+        verdict = REDIRECT
+    else:
+        verdict = ALIVE
+    return LinkResult(url, verdict, status, final_url, now_iso())
+
+
+class HostLimiter:
+    """Un sémaphore par hôte, créé à la demande."""
+
+    def __init__(self, per_host: int) -> None:
+        self.per_host = max(1, per_host)
+        self.lock = threading.Lock()
+        self.semaphores: dict[str, threading.Semaphore] = {}
+
+    def __call__(self, url: str) -> threading.Semaphore:
+        host = host_of(url)
+        with self.lock:
+            return self.semaphores.setdefault(host, threading.Semaphore(self.per_host))
+
+
+def interleave_by_host(urls: list[str]) -> list[str]:
+    """Alterne les hôtes pour que les workers ne s'empilent pas tous sur le même sémaphore."""
+    by_host: dict[str, list[str]] = {}
+    for url in urls:
+        by_host.setdefault(host_of(url), []).append(url)
+    queues = list(by_host.values())
+    out: list[str] = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        out.extend(q[i] for q in queues if i < len(q))
+    return out
+
+
+def check_all(urls: list[str], *, workers: int, per_host: int, user_agent: str, timeout_s: float) -> list[LinkResult]:
+    limiter = HostLimiter(per_host)
+    guard = ScrapeGuard(base_delay=0.0)
+    guard_lock = threading.Lock()
+
+    def one(url: str) -> LinkResult:
+        with guard_lock:
+            allowed = guard.allow(url)
+        if not allowed:
+            return LinkResult(url, BLOCKED, None, url, now_iso(), detail=CIRCUIT_OPEN, kind=CIRCUIT_OPEN)
+        with limiter(url):
+            result = check_url(url, user_agent=user_agent, timeout_s=timeout_s)
+        with guard_lock:
+            guard.record(url, result.kind)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(one, interleave_by_host(urls)))
+
+
+def load_cache(path: Path) -> dict[str, dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(cache: dict[str, dict], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(dict(sorted(cache.items())), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+def fix_amazon_urls(data_path: Path) -> int:
+    """Réécrit les url_amazon en /dp/<ASIN> ; renvoie le nombre de livres modifiés."""
+    raw = json.loads(data_path.read_text(encoding="utf-8"))
+    changed = 0
+    for book in raw.get("livres") or []:
+        url = str(book.get("url_amazon") or "")
+        fixed = canonical_amazon_url(url)
+        if url and fixed != url:
+            book["url_amazon"] = fixed
+            changed += 1
+    if changed:
+        data_path.write_text(json.dumps(raw, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return changed
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Vérifie les liens Amazon / Wikipédia du catalogue.")
+    parser.add_argument(
+        "--data",
+        action="append",
+        help="Fichier(s) du catalogue (défaut: data/bibliotheque.json, et bibliotheque.en.json s'il existe)",
+    )
+    parser.add_argument(
+        "--ttl-hours", type=float, default=168.0, help="Âge max d'un résultat en cache, en heures (défaut: 168)"
+    )
+    parser.add_argument("--workers", type=int, default=16, help="Requêtes simultanées au total (défaut: 16)")
+    parser.add_argument("--per-host", type=int, default=2, help="Requêtes simultanées par hôte (défaut: 2)")
+    parser.add_argument("--timeout", type=float, default=15.0, help="Timeout réseau par requête (secondes)")
+    parser.add_argument(
+        "--user-agent", default=DEFAULT_USER_AGENT, help="User-Agent utilisé pour les requêtes HTTP."
+    )
+    parser.add_argument("--report", default=None, help="Écrit le rapport complet en JSON à ce chemin")
+    parser.add_argument(
+        "--fix-amazon", action="store_true", help="Réécrit les url_amazon en https://www.amazon.fr/dp/<ASIN>"
+    )
+    args = parser.parse_args(argv)
+
+    data_paths = [Path(p) for p in args.data] if args.data else [
+        p for p in (Path("data/bibliotheque.json"), Path("data/bibliotheque.en.json")) if p.exists()
+    ]
+    links: dict[str, list[str]] = {}  # url -> livres qui la citent
+    for data_path in data_paths:
+        try:
+            if args.fix_amazon:
+                changed = fix_amazon_urls(data_path)
+                print(f"{data_path}: {changed} url_amazon normalisée(s)")
+            # bibliotheque.<lang>.json = traduction
+            cat = load_catalogue(data_path, kind="translation" if "." in data_path.stem else "catalogue")
+        except FileNotFoundError:
+            print(f"Erreur: fichier introuvable: {data_path}", file=sys.stderr)
+            return 2
+        except (CatalogueError, json.JSONDecodeError) as e:
+            print(f"Erreur: {data_path}: {e}", file=sys.stderr)
+            return 2
+        for book in cat:
+            for name in LINK_FIELDS:
+                url = str(book.get(name) or "").strip()
+                if url.startswith(("http://", "https://")):
+                    links.setdefault(url, []).append(f"{data_path.name}:{slug_of(book)}:{name}")
+
+    cache_path = data_paths[0].parent / CACHE_DIRNAME / CACHE_FILENAME if data_paths else None
+    cache = load_cache(cache_path) if cache_path else {}
+    ttl_s = max(0.0, args.ttl_hours) * 3600
+    stale = [url for url in links if url not in cache or is_stale(cache[url], ttl_s)]
+    print(f"{len(links)} liens, {len(links) - len(stale)} à jour en cache, {len(stale)} à vérifier")
+
+    t0 = time.perf_counter()
+    for result in check_all(
+        stale, workers=args.workers, per_host=args.per_host, user_agent=args.user_agent, timeout_s=args.timeout
+    ):
+        if result.kind != OK:
+            # Hôte qui bloque ou injoignable : le lien n'est pas en cause, on le retentera au prochain passage.
+            cache[result.url] = {**asdict(result), "checked_at": ""}
+        else:
+            cache[result.url] = asdict(result)
+    if stale:
+        print(f"Vérifiés en {time.perf_counter() - t0:.1f}s")
+    if cache_path:
+        save_cache(cache, cache_path)
+
+    report = []
+    counts: dict[str, int] = {}
+    for url, used_by in links.items():
+        entry = cache.get(url) or {}
+        verdict = str(entry.get("verdict") or BLOCKED)
+        counts[verdict] = counts.get(verdict, 0) + 1
+        report.append({**entry, "url": url, "used_by": used_by})
+        if verdict != ALIVE:
+            target = f" -> {entry.get('final_url')}" if verdict == REDIRECT else ""
+            status = entry.get("detail") or entry.get("status") or ""
+            print(f"[{verdict}] {status} {url}{target} ({', '.join(used_by)})")
+
+    print("Résumé: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Rapport: {args.report}")
+    return 1 if counts.get(DEAD) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
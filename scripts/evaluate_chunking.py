@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality / latency evaluation across chunking configurations.
+
+For every config, runs prepare_knowledgebase.py into its own folder, indexes the
+result with the local vector-store stand-in (local_vector_store.py), replays a
+file of labelled questions and prints one table row per config: recall@k, MRR,
+export and index size, index build time and query latency.
+
+Questions file (JSON Lines), one per line:
+  {"question": "Comment fixer le prix d'achat ?", "expected": "cours/acheter-une-entreprise.pdf"}
+`expected` is a source path as written in manifest.json (a list is accepted when
+several sources are correct answers).
+
+Usage:
+  python3 scripts/evaluate_chunking.py --questions eval/questions.jsonl
+  python3 scripts/evaluate_chunking.py --questions q.jsonl --config pages=20 --config pages=40,words=400,overlap=200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import shutil
+import statistics
+import sys
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import prepare_knowledgebase
+from local_vector_store import CHUNK_WORDS, OVERLAP_WORDS, LocalIndex, percentile
+
+
+DEFAULT_PAGES = (10, 20, 40, 80)
+RECALL_AT = (1, 3, 5, 10)
+# Fixed timestamp so every config produces comparable, reproducible exports.
+EVAL_GENERATED_AT = "2000-01-01T00:00:00+00:00"
+# Report lines of documents that prepare_knowledgebase.py could not convert (exit code 1).
+FAILED_RE = re.compile(r"^WARN (?:timeout|oom|error) ", re.MULTILINE)
+
+
+@dataclass
+class ChunkingConfig:
+    pages: int
+    words: int = CHUNK_WORDS
+    overlap: int = OVERLAP_WORDS
+
+    @property
+    def name(self) -> str:
+        return f"pages-{self.pages}-words-{self.words}-overlap-{self.overlap}"
+
+
+def parse_config(spec: str) -> ChunkingConfig:
+    values: dict[str, int] = {}
+    for part in spec.split(","):
+        key, sep, value = part.partition("=")
+        if not sep or key.strip() not in {"pages", "words", "overlap"} or not value.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"expected pages=N[,words=N][,overlap=N], got {spec!r}")
+        values[key.strip()] = int(value)
+    if "pages" not in values:
+        raise argparse.ArgumentTypeError(f"missing pages=N in {spec!r}")
+    return ChunkingConfig(**values)
+
+
+def load_questions(path: Path) -> list[tuple[str, set[str]]]:
+    out = []
+    for n, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        expected = item.get("expected")
+        expected = {expected} if isinstance(expected, str) else set(expected or [])
+        if not str(item.get("question") or "").strip() or not expected:
+            raise ValueError(f"{path}:{n}: needs 'question' and 'expected'")
+        out.append((str(item["question"]), expected))
+    return out
+
+
+def evaluate(index: LocalIndex, questions: list[tuple[str, set[str]]], *, depth: int) -> dict:
+    ranks: list[int | None] = []
+    latencies: list[float] = []
+    for question, expected in questions:
+        t0 = time.perf_counter()
+        hits = index.search(question, max_num_results=depth)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        # Rank over the distinct sources of the top `depth` passages: a source is what gets cited.
+        sources = list(dict.fromkeys(h["attributes"]["source_path"] for h in hits))
+        ranks.append(next((i for i, s in enumerate(sources, start=1) if s in expected), None))
+
+    latencies.sort()
+    total = len(questions) or 1
+    metrics = {f"recall@{k}": round(sum(1 for r in ranks if r is not None and r <= k) / total, 4) for k in RECALL_AT}
+    metrics["mrr"] = round(sum(1.0 / r for r in ranks if r is not None) / total, 4)
+    metrics["query_mean_ms"] = round(statistics.fmean(latencies), 3) if latencies else 0.0
+    metrics["query_p95_ms"] = round(percentile(latencies, 0.95), 3)
+    return metrics
+
+
+@dataclass
+class ConfigResult:
+    config: str
+    files: int
+    failed: int
+    passages: int
+    export_bytes: int
+    index_bytes: int
+    index_build_s: float
+    metrics: dict
+
+
+def run_config(config: ChunkingConfig, *, input_dir: Path, work: Path, reuse: bool, extra_args: list[str]) -> Path:
+    out = work / config.name
+    if reuse and (out / "manifest.json").exists():
+        return out
+    if out.exists():
+        shutil.rmtree(out)
+    argv = [
+        "--input",
+        str(input_dir),
+        "--output",
+        str(out),
+        "--chunk-pages",
+        str(config.pages),
+        "--generated-at",
+        EVAL_GENERATED_AT,
+        *extra_args,
+    ]
+    code = prepare_knowledgebase.main(argv)
+    # 1 = completed, but some documents timed out or failed (counted from report.txt).
+    if code not in (0, 1):
+        raise RuntimeError(f"prepare_knowledgebase.py failed for {config.name} (exit {code})")
+    return out
+
+
+def count_failed(out: Path) -> int:
+    try:
+        return len(FAILED_RE.findall((out / "report.txt").read_text(encoding="utf-8")))
+    except OSError:
+        return 0
+
+
+def format_table(results: list[ConfigResult]) -> str:
+    headers = ["config", "failed", *[f"R@{k}" for k in RECALL_AT], "MRR", "export", "index", "build", "q mean", "q p95"]
+    rows = []
+    for r in results:
+        m = r.metrics
+        rows.append(
+            [
+                r.config,
+                str(r.failed),
+                *[f"{m[f'recall@{k}']:.3f}" for k in RECALL_AT],
+                f"{m['mrr']:.3f}",
+                f"{r.export_bytes / 1024:.0f}K",
+                f"{r.index_bytes / 1024:.0f}K",
+                f"{r.index_build_s:.2f}s",
+                f"{m['query_mean_ms']:.2f}ms",
+                f"{m['query_p95_ms']:.2f}ms",
+            ]
+        )
+    widths = [max(len(str(x)) for x in col) for col in zip(headers, *rows)]
+    lines = [headers, ["-" * w for w in widths], *rows]
+    return "\n".join("  ".join(str(c).ljust(w) for c, w in zip(line, widths)).rstrip() for line in lines)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Compare retrieval quality and latency across chunking configs.")
+    parser.add_argument("--input", default="knowledgebase", help="Input folder (default: knowledgebase)")
+    parser.add_argument("--questions", required=True, help="Labelled questions (JSON Lines)")
+    parser.add_argument(
+        "--config",
+        action="append",
+        type=parse_config,
+        help="pages=N[,words=N][,overlap=N]; repeatable (default: pages=10/20/40/80)",
+    )
+    parser.add_argument(
+        "--work", default="knowledgebase_eval", help="Where exports are written (default: knowledgebase_eval)"
+    )
+    parser.add_argument("--reuse", action="store_true", help="Reuse existing exports instead of regenerating them")
+    parser.add_argument("--depth", type=int, default=max(RECALL_AT), help="Results retrieved per question")
+    parser.add_argument("--json", default=None, help="Also write the results as JSON to this path")
+    parser.add_argument(
+        "prepare_args",
+        nargs=argparse.REMAINDER,
+        help="Extra arguments passed to prepare_knowledgebase.py after '--' (e.g. -- --jobs 8)",
+    )
+    args = parser.parse_args(argv)
+
+    input_dir = Path(args.input)
+    if not input_dir.exists():
+        print(f"Input folder not found: {input_dir}", file=sys.stderr)
+        return 2
+    try:
+        questions = load_questions(Path(args.questions))
+    except (OSError, ValueError) as e:
+        print(f"Cannot read questions: {e}", file=sys.stderr)
+        return 2
+    if not questions:
+        print("No questions to evaluate.", file=sys.stderr)
+        return 2
+
+    configs = args.config or [ChunkingConfig(pages=p) for p in DEFAULT_PAGES]
+    extra = [a for a in args.prepare_args if a != "--"]
+    work = Path(args.work)
+    results: list[ConfigResult] = []
+    for config in configs:
+        try:
+            out = run_config(config, input_dir=input_dir, work=work, reuse=args.reuse, extra_args=extra)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 2
+        manifest = json.loads((out / "manifest.json").read_text(encoding="utf-8"))
+        t0 = time.perf_counter()
+        index = LocalIndex.from_export(out, chunk_words=config.words, overlap_words=config.overlap)
+        build_s = time.perf_counter() - t0
+        results.append(
+            ConfigResult(
+                config=config.name,
+                files=len(index.files),
+                failed=count_failed(out),
+                passages=len(index.passages),
+                export_bytes=sum(int(d["bytes"]) for d in manifest.get("documents") or []),
+                index_bytes=index.nbytes(),
+                index_build_s=round(build_s, 3),
+                metrics=evaluate(index, questions, depth=max(1, args.depth)),
+            )
+        )
+
+    print(f"{len(questions)} questions")
+    print(format_table(results))
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps([asdict(r) for r in results], ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
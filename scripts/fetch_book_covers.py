@@ -6,11 +6,22 @@ import json
 import html
 import re
 import sys
-import time
 import urllib.error
 import urllib.request
 from pathlib import Path
 
+from catalogue import CACHE_DIRNAME, CatalogueError, extract_asin_from_amazon_url, load_catalogue, slug_of
+from scrape_guard import (
+    BLOCKING_KINDS,
+    CIRCUIT_OPEN,
+    OK,
+    OPENLIBRARY_COVER_URL,
+    STATE_FILENAME,
+    ScrapeGuard,
+    classify_exception,
+    classify_response,
+)
+
 
 def resolve_image_path(raw: str, project_root: Path) -> Path:
     p = Path(str(raw or ""))
@@ -34,24 +45,18 @@ def extract_isbn_from_amazon_url(url: str) -> str | None:
     return None
 
 
-def extract_asin_from_amazon_url(url: str) -> str | None:
-    m = re.search(r"/dp/([A-Z0-9]{10})", url)
-    if m:
-        return m.group(1)
-    m = re.search(r"/gp/product/([A-Z0-9]{10})", url)
-    if m:
-        return m.group(1)
-    return None
+def amazon_page_url(url: str) -> str:
+    asin = extract_asin_from_amazon_url(url)
+    return f"https://www.amazon.fr/dp/{asin}" if asin else url
 
 
 def fetch_amazon_cover_url(
     url: str,
     user_agent: str,
     timeout_s: int,
-) -> str | None:
-    asin = extract_asin_from_amazon_url(url)
-    if asin:
-        url = f"https://www.amazon.fr/dp/{asin}"
+) -> tuple[str | None, str]:
+    """URL de la couverture (ou None) et classement de la réponse (voir scrape_guard)."""
+    url = amazon_page_url(url)
 
     req = urllib.request.Request(
         url,
@@ -64,20 +69,27 @@ def fetch_amazon_cover_url(
     try:
         with urllib.request.urlopen(req, timeout=timeout_s) as resp:
             page = resp.read(900_000).decode("utf-8", "ignore")
-    except (urllib.error.HTTPError, urllib.error.URLError, TimeoutError):
-        return None
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        return None, classify_response(e.code, e.read(200_000).decode("utf-8", "ignore"))
+    except (urllib.error.URLError, TimeoutError) as e:
+        return None, classify_exception(e)
+
+    kind = classify_response(status, page)
+    if kind != OK:
+        return None, kind
 
     m = re.search(r'id="landingImage"[^>]+data-a-dynamic-image="([^"]+)"', page)
     if not m:
         m = re.search(r'data-a-dynamic-image="([^"]+)"', page)
     if not m:
-        return None
+        return None, OK
 
     raw = html.unescape(m.group(1))
     try:
         data = json.loads(raw)
     except json.JSONDecodeError:
-        return None
+        return None, OK
 
     best_url = None
     best_area = -1
@@ -95,7 +107,7 @@ def fetch_amazon_cover_url(
             best_url = u
 
     if not best_url:
-        return None
+        return None, OK
 
     # Try to upgrade to a larger variant when possible.
     upgrade_candidates: list[str] = [best_url]
@@ -109,8 +121,8 @@ def fetch_amazon_cover_url(
     for candidate in upgrade_candidates:
         # Light validation: must look like an image URL.
         if re.search(r"\.(jpe?g|png)\b", candidate, re.IGNORECASE):
-            return candidate
-    return best_url
+            return candidate, OK
+    return best_url, OK
 
 
 def download(url: str, dest: Path, user_agent: str, timeout_s: int) -> bool:
@@ -148,8 +160,13 @@ def main(argv: list[str]) -> int:
     )
     parser.add_argument("--force", action="store_true", help="Réécrit les images existantes.")
     parser.add_argument("--limit", type=int, default=0, help="Limite le nombre de téléchargements (0 = illimité).")
-    parser.add_argument("--sleep", type=float, default=0.35, help="Pause entre téléchargements (secondes).")
+    parser.add_argument("--sleep", type=float, default=0.35, help="Délai min. entre requêtes à un même hôte (s).")
     parser.add_argument("--timeout", type=int, default=15, help="Timeout réseau par image (secondes).")
+    parser.add_argument(
+        "--queued-only",
+        action="store_true",
+        help="Ne traite que les livres mis en file lors d'un passage précédent (Amazon bloqué).",
+    )
     parser.add_argument(
         "--user-agent",
         default="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
@@ -163,54 +180,85 @@ def main(argv: list[str]) -> int:
         return 2
     project_root = data_path.resolve().parent.parent
 
-    raw = json.loads(data_path.read_text(encoding="utf-8"))
-    books = raw.get("livres")
-    if not isinstance(books, list):
-        print("Erreur: JSON inattendu (clé 'livres' manquante ou invalide).", file=sys.stderr)
+    try:
+        books = load_catalogue(data_path).books
+    except CatalogueError as e:
+        print(f"Erreur: {data_path}: {e}", file=sys.stderr)
         return 2
 
+    guard = ScrapeGuard(data_path.parent / CACHE_DIRNAME / STATE_FILENAME, base_delay=float(args.sleep))
+    if args.queued_only:
+        books = [b for b in books if slug_of(b) in guard.queue]
+
     downloaded = 0
     skipped = 0
     failed = 0
+    queued = 0
 
-    for b in books:
-        title = str(b.get("titre") or "").strip() or "(sans titre)"
-        dest = resolve_image_path(str(b.get("image") or ""), project_root)
-        if not str(dest).endswith((".jpg", ".jpeg", ".png", ".webp")):
-            failed += 1
-            print(f"[skip] {title}: champ 'image' invalide ({b.get('image')})")
-            continue
-
-        if dest.exists() and dest.stat().st_size > 0 and not args.force:
-            skipped += 1
-            continue
-
-        url_amazon = str(b.get("url_amazon") or "").strip()
-        ok = False
-        if args.source in ("auto", "amazon"):
-            cover_url = fetch_amazon_cover_url(url_amazon, user_agent=args.user_agent, timeout_s=args.timeout)
-            if cover_url:
-                ok = download(cover_url, dest, user_agent=args.user_agent, timeout_s=args.timeout)
-
-        if not ok and args.source in ("auto", "openlibrary"):
-            isbn = extract_isbn_from_amazon_url(url_amazon)
-            if isbn:
-                cover_url = f"https://covers.openlibrary.org/b/isbn/{isbn}-L.jpg?default=false"
-                ok = download(cover_url, dest, user_agent=args.user_agent, timeout_s=args.timeout)
-
-        if ok:
-            downloaded += 1
-            print(f"[ok] {title} -> {dest}")
-        else:
-            failed += 1
-            print(f"[fail] {title}: cover introuvable")
-
-        if args.limit and downloaded >= args.limit:
-            break
-        time.sleep(max(0.0, float(args.sleep)))
-
-    print(f"Terminé: téléchargés={downloaded} ignorés={skipped} échecs={failed}")
-    return 0 if failed == 0 else 1
+    try:
+        for b in books:
+            title = str(b.get("titre") or "").strip() or "(sans titre)"
+            key = slug_of(b) or title
+            dest = resolve_image_path(str(b.get("image") or ""), project_root)
+            if not str(dest).endswith((".jpg", ".jpeg", ".png", ".webp")):
+                failed += 1
+                print(f"[skip] {title}: champ 'image' invalide ({b.get('image')})")
+                continue
+
+            if dest.exists() and dest.stat().st_size > 0 and not args.force:
+                skipped += 1
+                guard.dequeue(key)
+                continue
+
+            url_amazon = str(b.get("url_amazon") or "").strip()
+            ok = False
+            amazon_kind = OK
+            if args.source in ("auto", "amazon") and url_amazon:
+                page_url = amazon_page_url(url_amazon)
+                if guard.allow(page_url):
+                    guard.pace(page_url)
+                    cover_url, amazon_kind = fetch_amazon_cover_url(
+                        page_url, user_agent=args.user_agent, timeout_s=args.timeout
+                    )
+                    if guard.record(page_url, amazon_kind):
+                        print(
+                            f"[breaker] Amazon bloqué ({amazon_kind}), requêtes suspendues jusqu'à "
+                            f"{guard.open_until(page_url)} ; suite via OpenLibrary"
+                        )
+                    if cover_url:
+                        ok = download(cover_url, dest, user_agent=args.user_agent, timeout_s=args.timeout)
+                else:
+                    amazon_kind = CIRCUIT_OPEN
+
+            if not ok and args.source in ("auto", "openlibrary"):
+                isbn = extract_isbn_from_amazon_url(url_amazon)
+                if isbn:
+                    cover_url = OPENLIBRARY_COVER_URL.format(isbn=isbn)
+                    # Amazon est espacé par guard.pace() ; --sleep s'applique aussi entre requêtes OpenLibrary.
+                    guard.pace(cover_url)
+                    ok = download(cover_url, dest, user_agent=args.user_agent, timeout_s=args.timeout)
+
+            if ok:
+                downloaded += 1
+                guard.dequeue(key)
+                print(f"[ok] {title} -> {dest}")
+            elif amazon_kind in BLOCKING_KINDS or amazon_kind == CIRCUIT_OPEN:
+                queued += 1
+                guard.enqueue(key, title=title, url=url_amazon, reason=amazon_kind)
+                print(f"[queued] {title}: Amazon bloqué ({amazon_kind}), à relancer plus tard")
+            else:
+                failed += 1
+                print(f"[fail] {title}: cover introuvable")
+
+            if args.limit and downloaded >= args.limit:
+                break
+    finally:
+        guard.save()
+
+    print(f"Terminé: téléchargés={downloaded} ignorés={skipped} échecs={failed} en_file={queued}")
+    if guard.queue:
+        print(f"{len(guard.queue)} livre(s) en file : relancer plus tard avec --queued-only")
+    return 0 if failed == 0 and queued == 0 else 1
 
 
 if __name__ == "__main__":
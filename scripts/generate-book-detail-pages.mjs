@@ -5,6 +5,7 @@ const PROJECT_ROOT = path.resolve(new URL(".", import.meta.url).pathname, "..");
 
 const DATA_PATH = path.join(PROJECT_ROOT, "data", "bibliotheque.json");
 const PAGES_DIR = path.join(PROJECT_ROOT, "pages");
+const TEMPLATE_PATH = path.join(PROJECT_ROOT, "scripts", "book-detail-template.html");
 
 const slugify = (input) => {
   const base = String(input || "")
@@ -216,71 +217,12 @@ const whyEntrepreneur = ({ categorie, tags }) => {
   return bullets.slice(0, 3);
 };
 
-const pageTemplate = ({ bd, titre, resume_court }) => `<!doctype html>
-<html lang="fr">
-  <head>
-    <meta charset="utf-8" />
-    <meta name="viewport" content="width=device-width, initial-scale=1" />
-    <title>${escapeHtml(titre)} — The Entrepreneur Whisperer</title>
-    <meta name="description" content="${escapeHtml(resume_court || `Présentation du livre ${titre}.`)}" />
-    <link rel="icon" type="image/png" href="../img/founder_hacks_compass_refined_v2_1024.png" />
-    <link rel="stylesheet" href="../assets/styles.css" />
-  </head>
-  <body data-page="book-detail" data-book="${escapeHtml(bd)}">
-    <a class="skipLink" href="#contenu">Aller au contenu</a>
-
-    <header class="siteHeader" data-surface="page">
-      <nav class="nav" aria-label="Menu principal">
-        <a class="brand" href="../index.html" aria-label="The Entrepreneur Whisperer (Accueil)">
-          <img
-            class="brandMark"
-            src="../img/founder_hacks_compass_refined_v4_1024.png"
-            alt=""
-            width="34"
-            height="34"
-            loading="eager"
-          />
-          <span class="brandText">The Entrepreneur Whisperer</span>
-        </a>
-
-        <button class="navToggle" type="button" aria-expanded="false" aria-controls="navPanel">
-          <span class="navToggleIcon" aria-hidden="true"></span>
-          <span class="srOnly">Ouvrir le menu</span>
-        </button>
-
-        <div class="navPanel" id="navPanel">
-          <a class="navLink" href="../index.html">Accueil</a>
-          <a class="navLink" href="assistant-ia.html">Assistant IA</a>
-          <a class="navLink" href="conseils.html">Conseils</a>
-          <a class="navLink isActive" href="bibliotheque.html">Bibliothèque</a>
-          <a class="navLink" href="a-propos.html">À propos</a>
-        </div>
-      </nav>
-
-      <section class="pageHero" id="contenu" style="padding: 1rem 0;">
-        <div class="container"></div>
-      </section>
-    </header>
-
-    <main class="main">
-      <section class="section" style="padding-top: 1rem;">
-        <div class="container">
-          <div id="bookDetailMount"></div>
-        </div>
-      </section>
-    </main>
-
-    <footer class="footer">
-      <div class="container footerRow">
-        <p class="muted">© <span data-year></span> The Entrepreneur Whisperer</p>
-        <a class="footerLegal" href="mentions-legales.html">Mentions légales</a>
-      </div>
-    </footer>
-
-    <script src="../assets/main.js" defer></script>
-  </body>
-</html>
-`;
+// Shared with scripts/build_book_pages.py (incremental rebuild of pages/*.html).
+const pageTemplate = ({ template, bd, titre, resume_court }) =>
+  template
+    .replaceAll("{{titre}}", () => escapeHtml(titre))
+    .replaceAll("{{description}}", () => escapeHtml(resume_court || `Présentation du livre ${titre}.`))
+    .replaceAll("{{bd}}", () => escapeHtml(bd));
 
 const escapeHtml = (text) =>
   String(text).replaceAll("&", "&amp;").replaceAll("<", "&lt;").replaceAll(">", "&gt;").replaceAll('"', "&quot;");
@@ -289,6 +231,7 @@ const main = async () => {
   const raw = await readFile(DATA_PATH, "utf8");
   const data = JSON.parse(raw);
   const livres = Array.isArray(data?.livres) ? data.livres : [];
+  const template = await readFile(TEMPLATE_PATH, "utf8");
 
   const updated = [];
 
@@ -303,7 +246,7 @@ const main = async () => {
     const pagePath = path.join(PAGES_DIR, bd);
 
     if (!isCustom && !(await fileExists(pagePath))) {
-      const html = pageTemplate({ bd, titre, resume_court: book.resume_court });
+      const html = pageTemplate({ template, bd, titre, resume_court: book.resume_court });
       await writeFile(pagePath, html, "utf8");
       console.log(`+ page ${path.relative(PROJECT_ROOT, pagePath)}`);
     }
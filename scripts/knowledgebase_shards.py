@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Sharded export format for knowledgebase_clean.
+
+Chunks are packed into size-bounded shards (`shards/shard-00000.jsonl.gz`).
+Every record is one JSON line `{"id", "path", "content"}` compressed as its own
+gzip member (or zstd frame). Concatenated members are still a valid stream, so a
+shard can be read sequentially with `zcat` / `zstdcat`, while `shards/index.json`
+stores the byte offset and length of each record for random access by id.
+
+Usage:
+  python3 scripts/knowledgebase_shards.py ls knowledgebase_clean
+  python3 scripts/knowledgebase_shards.py get knowledgebase_clean <id>
+  python3 scripts/knowledgebase_shards.py unpack knowledgebase_clean [--dest DIR]
+  python3 scripts/knowledgebase_shards.py batches knowledgebase_clean [--size 20]
+
+`batches` streams the records to stdout, one JSON array per batch and per line,
+without writing any file: upload_knowledgebase_clean.mjs reads this stream when
+the export uses --format shards.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sys
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+
+SHARDS_DIRNAME = "shards"
+INDEX_FILENAME = "index.json"
+SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def available_compressions() -> list[str]:
+    return ["gzip", "zstd"] if zstandard is not None else ["gzip"]
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires: pip install zstandard")
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd shards require: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown compression: {compression}")
+
+
+@dataclass
+class ShardRecord:
+    id: str
+    path: str
+    shard: str
+    offset: int
+    length: int
+
+
+class ShardWriter:
+    """Appends chunks to size-bounded shards and writes the offset index on close()."""
+
+    def __init__(
+        self,
+        output_root: Path,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        compression: str = "gzip",
+        prefix: str = "shard",
+        index_name: str = INDEX_FILENAME,
+    ) -> None:
+        if compression not in SUFFIXES:
+            raise ValueError(f"unknown compression: {compression}")
+        self.shards_dir = output_root / SHARDS_DIRNAME
+        self.max_bytes = max(1, max_bytes)
+        self.compression = compression
+        self.prefix = prefix
+        self.index_name = index_name
+        self.records: list[ShardRecord] = []
+        self.shards: list[dict] = []
+        self._fh = None
+        self._name = ""
+        self._size = 0
+        self._count = 0
+
+    def _rotate(self) -> None:
+        self._close_current()
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        self._name = f"{self.prefix}-{len(self.shards):05d}{SUFFIXES[self.compression]}"
+        self._fh = (self.shards_dir / self._name).open("wb")
+        self._size = 0
+        self._count = 0
+
+    def _close_current(self) -> None:
+        if self._fh is None:
+            return
+        self._fh.close()
+        self.shards.append({"name": self._name, "bytes": self._size, "records": self._count})
+        self._fh = None
+
+    def write(self, path: str, chunk_id: str, content: str) -> None:
+        line = json.dumps({"id": chunk_id, "path": path, "content": content}, ensure_ascii=False) + "\n"
+        member = compress(line.encode("utf-8"), self.compression)
+        if self._fh is None or (self._count and self._size + len(member) > self.max_bytes):
+            self._rotate()
+        self._fh.write(member)
+        self.records.append(ShardRecord(chunk_id, path, self._name, self._size, len(member)))
+        self._size += len(member)
+        self._count += 1
+
+    def close(self) -> None:
+        self._close_current()
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        index = {
+            "version": 1,
+            "compression": self.compression,
+            "shards": self.shards,
+            "records": [asdict(r) for r in self.records],
+        }
+        (self.shards_dir / self.index_name).write_text(
+            json.dumps(index, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+
+
+class ShardReader:
+    """Random access (by chunk id) and streaming access over a shard directory."""
+
+    def __init__(self, output_root: Path, *, index_name: str = INDEX_FILENAME) -> None:
+        self.shards_dir = output_root / SHARDS_DIRNAME
+        index = json.loads((self.shards_dir / index_name).read_text(encoding="utf-8"))
+        self.compression = str(index.get("compression") or "gzip")
+        self.shards = list(index.get("shards") or [])
+        self.records = [ShardRecord(**r) for r in index.get("records") or []]
+        self.by_id = {r.id: r for r in self.records}
+
+    def _read(self, record: ShardRecord, fh=None) -> dict:
+        if fh is None:
+            with (self.shards_dir / record.shard).open("rb") as f:
+                f.seek(record.offset)
+                data = f.read(record.length)
+        else:
+            fh.seek(record.offset)
+            data = fh.read(record.length)
+        return json.loads(decompress(data, self.compression))
+
+    def get(self, chunk_id: str) -> dict:
+        return self._read(self.by_id[chunk_id])
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yield every record in write order, keeping one shard open at a time."""
+        fh = None
+        current = ""
+        try:
+            for record in self.records:
+                if record.shard != current:
+                    if fh is not None:
+                        fh.close()
+                    fh = (self.shards_dir / record.shard).open("rb")
+                    current = record.shard
+                yield self._read(record, fh)
+        finally:
+            if fh is not None:
+                fh.close()
+
+    def iter_batches(self, size: int) -> Iterator[list[dict]]:
+        batch: list[dict] = []
+        for record in self.iter_records():
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def unpack(output_root: Path, dest: Path) -> int:
+    """Recreate the one-Markdown-file-per-chunk layout from the shards."""
+    count = 0
+    for record in ShardReader(output_root).iter_records():
+        path = dest / record["path"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(record["content"], encoding="utf-8")
+        count += 1
+    return count
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Inspect or unpack a sharded knowledgebase_clean export.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ls = sub.add_parser("ls", help="List shards and record counts")
+    p_ls.add_argument("root", nargs="?", default="knowledgebase_clean")
+    p_get = sub.add_parser("get", help="Print one chunk by id")
+    p_get.add_argument("root")
+    p_get.add_argument("id")
+    p_unpack = sub.add_parser("unpack", help="Write chunks back as Markdown files")
+    p_unpack.add_argument("root", nargs="?", default="knowledgebase_clean")
+    p_unpack.add_argument("--dest", default=None, help="Destination folder (default: the export folder itself)")
+    p_batches = sub.add_parser("batches", help="Stream records as JSON Lines, one batch per line")
+    p_batches.add_argument("root", nargs="?", default="knowledgebase_clean")
+    p_batches.add_argument("--size", type=int, default=20, help="Records per batch (default: 20)")
+    args = parser.parse_args(argv)
+
+    root = Path(args.root)
+    if not (root / SHARDS_DIRNAME / INDEX_FILENAME).exists():
+        print(f"Shard index not found: {root / SHARDS_DIRNAME / INDEX_FILENAME}", file=sys.stderr)
+        return 2
+    reader = ShardReader(root)
+
+    if args.command == "ls":
+        for shard in reader.shards:
+            print(f"{shard['name']}\t{shard['records']} records\t{shard['bytes']} bytes")
+        print(f"{len(reader.records)} records ({reader.compression})")
+        return 0
+
+    if args.command == "get":
+        if args.id not in reader.by_id:
+            print(f"Unknown chunk id: {args.id}", file=sys.stderr)
+            return 1
+        sys.stdout.write(reader.get(args.id)["content"])
+        return 0
+
+    if args.command == "batches":
+        for batch in reader.iter_batches(max(1, args.size)):
+            sys.stdout.write(json.dumps(batch, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+        return 0
+
+    dest = Path(args.dest) if args.dest else root
+    count = unpack(root, dest)
+    print(f"Unpacked {count} chunks in {dest}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI vector store used by api/assistant.js.
+
+Loads `knowledgebase_clean/` (Markdown tree or shards) and its manifest, splits
+every file into overlapping chunks like file_search does, and answers
+`POST /v1/vector_stores/<id>/search` with the same result shape as the API
+(`file_id`, `filename`, `score`, `attributes`, `content[].text`). Ranking is
+BM25 on accent-folded terms, not embeddings: the point is realistic payloads
+and latencies for load tests, offline and in CI.
+
+Usage:
+  python3 scripts/local_vector_store.py serve [--root knowledgebase_clean] [--port 8765]
+  OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_VECTOR_STORE_ID=vs_local ... (assistant, manual RAG mode)
+  python3 scripts/local_vector_store.py bench --url http://127.0.0.1:8765 --concurrency 16 --requests 2000
+  python3 scripts/local_vector_store.py bench --in-process --queries questions.txt
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import pickle
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from build_search_index import terms_of
+from knowledgebase_shards import ShardReader
+
+
+# file_search defaults: 800-token chunks with 400 tokens of overlap (~0.75 word per token).
+CHUNK_WORDS = 600
+OVERLAP_WORDS = 300
+BM25_K1 = 1.2
+BM25_B = 0.75
+# BM25 is unbounded; s / (s + SCORE_HALF) maps it to [0, 1) like the API scores.
+SCORE_HALF = 10.0
+FRONTMATTER_RE = re.compile(r"\A---\n.*?\n---\n+", re.DOTALL)
+WORD_SPAN_RE = re.compile(r"\S+")
+SEARCH_PATH_RE = re.compile(r"^/v1/vector_stores/([^/]+)/search$")
+
+
+@dataclass
+class Passage:
+    file: int
+    text: str
+
+
+class LocalIndex:
+    def __init__(self) -> None:
+        self.files: list[dict] = []  # {"file_id", "filename", "attributes"}
+        self.passages: list[Passage] = []
+        self.lengths: list[int] = []
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.avg_len = 0.0
+
+    @classmethod
+    def from_export(
+        cls, root: Path, *, chunk_words: int = CHUNK_WORDS, overlap_words: int = OVERLAP_WORDS
+    ) -> "LocalIndex":
+        manifest = json.loads((root / "manifest.json").read_text(encoding="utf-8"))
+        reader = ShardReader(root) if manifest.get("format") == "shards" else None
+        index = cls()
+        for doc in manifest.get("documents") or []:
+            if reader is not None:
+                content = reader.get(doc["id"])["content"]
+            else:
+                content = (root / doc["output_path"]).read_text(encoding="utf-8")
+            index.add_file(
+                file_id=f"file-{doc['id']}",
+                filename=Path(doc["output_path"]).name,
+                attributes={"source_path": doc["source_path"], "title": doc["title"]},
+                text=FRONTMATTER_RE.sub("", content),
+                chunk_words=chunk_words,
+                overlap_words=overlap_words,
+            )
+        index.finalize()
+        return index
+
+    def add_file(
+        self, *, file_id: str, filename: str, attributes: dict, text: str, chunk_words: int, overlap_words: int
+    ) -> None:
+        file_no = len(self.files)
+        self.files.append({"file_id": file_id, "filename": filename, "attributes": attributes})
+        # Slice the original text on word boundaries so passages keep their line breaks.
+        spans = [m.span() for m in WORD_SPAN_RE.finditer(text)]
+        step = max(1, chunk_words - overlap_words)
+        for start in range(0, len(spans), step):
+            end = min(len(spans), start + chunk_words)
+            self._add_passage(file_no, text[spans[start][0] : spans[end - 1][1]])
+            if end >= len(spans):
+                break
+
+    def _add_passage(self, file_no: int, text: str) -> None:
+        pid = len(self.passages)
+        self.passages.append(Passage(file_no, text))
+        counts: dict[str, int] = {}
+        for term in terms_of(text):
+            counts[term] = counts.get(term, 0) + 1
+        self.lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append((pid, tf))
+
+    def finalize(self) -> None:
+        self.avg_len = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def nbytes(self) -> int:
+        """Serialized size of the index (postings, lengths and passage text)."""
+        data = (self.files, self.passages, self.lengths, self.postings)
+        return len(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def search_passages(self, query: str, k: int) -> list[tuple[float, int]]:
+        n = len(self.passages)
+        scores: dict[int, float] = {}
+        for term in dict.fromkeys(terms_of(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for pid, tf in plist:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[pid] / (self.avg_len or 1.0))
+                scores[pid] = scores.get(pid, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        top = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+        return [(s / (s + SCORE_HALF), pid) for pid, s in top]
+
+    def search(self, query: str, *, max_num_results: int = 10, score_threshold: float = 0.0) -> list[dict]:
+        """Results shaped like `client.vectorStores.search(...).data`."""
+        results = []
+        for score, pid in self.search_passages(query, max_num_results):
+            if score < score_threshold:
+                continue
+            passage = self.passages[pid]
+            f = self.files[passage.file]
+            results.append(
+                {
+                    "file_id": f["file_id"],
+                    "filename": f["filename"],
+                    "score": round(score, 6),
+                    "attributes": f["attributes"],
+                    "content": [{"type": "text", "text": passage.text}],
+                }
+            )
+        return results
+
+
+def make_handler(index: LocalIndex):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002 - signature from the base class
+            pass
+
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path in {"/health", "/v1/health"}:
+                self._send(200, {"ok": True, "files": len(index.files), "chunks": len(index.passages)})
+                return
+            self._send(404, {"error": {"message": f"Unknown path: {self.path}"}})
+
+        def do_POST(self) -> None:  # noqa: N802
+            m = SEARCH_PATH_RE.match(self.path.split("?", 1)[0])
+            if not m:
+                self._send(404, {"error": {"message": f"Unknown path: {self.path}"}})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError):
+                self._send(400, {"error": {"message": "Invalid JSON body"}})
+                return
+            if not isinstance(body, dict):
+                self._send(400, {"error": {"message": "JSON body must be an object"}})
+                return
+            query = body.get("query")
+            if isinstance(query, list):
+                query = " ".join(str(q) for q in query)
+            if not str(query or "").strip():
+                self._send(400, {"error": {"message": "Missing query"}})
+                return
+            try:
+                max_num_results = max(1, min(50, int(body.get("max_num_results") or 10)))
+                ranking = body.get("ranking_options") or {}
+                score_threshold = float(ranking.get("score_threshold") or 0.0)
+            except (TypeError, ValueError, AttributeError):
+                self._send(400, {"error": {"message": "Invalid max_num_results or ranking_options.score_threshold"}})
+                return
+            data = index.search(str(query), max_num_results=max_num_results, score_threshold=score_threshold)
+            self._send(
+                200,
+                {
+                    "object": "vector_store.search_results.page",
+                    "search_query": [str(query)],
+                    "data": data,
+                    "has_more": False,
+                    "next_page": None,
+                },
+            )
+
+    return Handler
+
+
+def sample_queries(index: LocalIndex, count: int, seed: int = 0) -> list[str]:
+    """Short word windows taken from the corpus, as a stand-in for real questions."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        if not index.passages:
+            break
+        words = rng.choice(index.passages).text.split()
+        size = rng.randint(3, 8)
+        start = rng.randint(0, max(0, len(words) - size))
+        out.append(" ".join(words[start : start + size]))
+    return out
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[i]
+
+
+def run_load(search, queries: list[str], *, requests: int, concurrency: int) -> dict:
+    """Fire `requests` searches from `concurrency` threads; latency percentiles in ms."""
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            search(queries[i % len(queries)])
+            ok = True
+        except Exception:
+            ok = False
+        ms = (time.perf_counter() - t0) * 1000.0
+        with lock:
+            if ok:
+                latencies.append(ms)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def http_search(url: str, store_id: str, max_num_results: int, timeout_s: float):
+    endpoint = f"{url.rstrip('/')}/v1/vector_stores/{store_id}/search"
+
+    def search(query: str) -> dict:
+        body = json.dumps({"query": query, "max_num_results": max_num_results}).encode("utf-8")
+        req = urllib.request.Request(endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(req, timeout=timeout_s) as resp:
+            return json.loads(resp.read())
+
+    return search
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Local vector-store stand-in and load generator for the assistant.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Serve vector store search over HTTP")
+    p_serve.add_argument("--root", default="knowledgebase_clean", help="Export folder (default: knowledgebase_clean)")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765)
+
+    p_bench = sub.add_parser("bench", help="Concurrent load test; reports p50/p95/p99 and throughput")
+    p_bench.add_argument("--root", default="knowledgebase_clean", help="Export folder (default: knowledgebase_clean)")
+    p_bench.add_argument("--url", default="http://127.0.0.1:8765", help="Server to load (default: local serve)")
+    p_bench.add_argument("--in-process", action="store_true", help="Query the index directly instead of over HTTP")
+    p_bench.add_argument("--store-id", default="vs_local")
+    p_bench.add_argument("--queries", default=None, help="One query per line (default: sampled from the corpus)")
+    p_bench.add_argument("--requests", type=int, default=1000)
+    p_bench.add_argument("--concurrency", type=int, default=8)
+    p_bench.add_argument("--max-results", type=int, default=9, help="max_num_results per query (default: 9)")
+    p_bench.add_argument("--timeout", type=float, default=10.0)
+    p_bench.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    root = Path(args.root)
+    if not (root / "manifest.json").exists() and (args.command == "serve" or args.in_process or not args.queries):
+        print(f"Manifest not found: {root / 'manifest.json'}", file=sys.stderr)
+        print("Run: python3 scripts/prepare_knowledgebase.py", file=sys.stderr)
+        return 2
+
+    if args.command == "serve":
+        t0 = time.perf_counter()
+        index = LocalIndex.from_export(root)
+        print(
+            f"Indexed {len(index.files)} files / {len(index.passages)} chunks in {time.perf_counter() - t0:.2f}s "
+            f"({index.nbytes()} bytes)"
+        )
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(index))
+        print(f"Serving on http://{args.host}:{args.port}/v1 (any vector store id)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    index = LocalIndex.from_export(root) if (args.in_process or not args.queries) else None
+    if args.queries:
+        queries = [q.strip() for q in Path(args.queries).read_text(encoding="utf-8").splitlines() if q.strip()]
+    else:
+        queries = sample_queries(index, 200)
+    if not queries:
+        print("No queries to run.", file=sys.stderr)
+        return 2
+
+    if args.in_process:
+        search = lambda q: index.search(q, max_num_results=args.max_results)  # noqa: E731
+    else:
+        search = http_search(args.url, args.store_id, args.max_results, args.timeout)
+    report = run_load(search, queries, requests=max(1, args.requests), concurrency=args.concurrency)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"{report['requests']} requests, concurrency {report['concurrency']}: "
+            f"{report['throughput_rps']} req/s, p50 {report['p50_ms']}ms, p95 {report['p95_ms']}ms, "
+            f"p99 {report['p99_ms']}ms, errors {report['errors']}"
+        )
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+PDF text extraction backends for prepare_knowledgebase.py.
+
+Each backend opens a PDF and returns the text of a page range, one string per
+page. pypdf is the default; pdfminer.six and poppler's `pdftotext` are used when
+installed, either as the primary engine or as a per-page fallback when the
+primary one returns no text.
+
+`benchmark()` measures every available backend on a sample of the corpus and
+`choose_engines()` turns the saved results into an engine order: the fastest
+backend whose text coverage is within COVERAGE_TOLERANCE of the best one first.
+
+Usage:
+  python3 scripts/pdf_backends.py knowledgebase [--sample 8] [--pages 20] [--save knowledgebase_clean/pdf_engines.json]
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import re
+import shutil
+import subprocess
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+
+DEFAULT_ORDER = ("pypdf", "pdftotext", "pdfminer")
+COVERAGE_TOLERANCE = 0.02
+
+
+class PdfDocument(ABC):
+    page_count: int = 0
+
+    @abstractmethod
+    def extract_pages(self, start: int, end: int) -> list[str]:
+        """Text of pages [start, end) (0-based); "" for pages that failed or have no text."""
+
+    def close(self) -> None:
+        pass
+
+
+class PdfBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def available(self) -> bool:
+        ...
+
+    @abstractmethod
+    def open(self, path: Path) -> PdfDocument:
+        ...
+
+
+class _PypdfDocument(PdfDocument):
+    def __init__(self, path: Path) -> None:
+        from pypdf import PdfReader  # type: ignore
+
+        self.reader = PdfReader(str(path))
+        self.page_count = len(self.reader.pages)
+
+    def extract_pages(self, start: int, end: int) -> list[str]:
+        out: list[str] = []
+        for i in range(start, end):
+            try:
+                out.append(self.reader.pages[i].extract_text() or "")
+            except Exception:
+                out.append("")
+        return out
+
+
+class PypdfBackend(PdfBackend):
+    name = "pypdf"
+
+    def available(self) -> bool:
+        try:
+            import pypdf  # type: ignore  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    def open(self, path: Path) -> PdfDocument:
+        return _PypdfDocument(path)
+
+
+def _split_pages(text: str, count: int) -> list[str]:
+    # pdftotext ends every page with a form feed.
+    pages = text.split("\x0c")[:count]
+    return pages + [""] * (count - len(pages))
+
+
+class _PdfminerDocument(PdfDocument):
+    def __init__(self, path: Path) -> None:
+        from pdfminer.layout import LAParams  # type: ignore
+        from pdfminer.pdfdocument import PDFDocument  # type: ignore
+        from pdfminer.pdfinterp import PDFResourceManager  # type: ignore
+        from pdfminer.pdfpage import PDFPage  # type: ignore
+        from pdfminer.pdfparser import PDFParser  # type: ignore
+
+        # Parse the file once and keep it open: pdfminer resolves objects lazily
+        # from it, and extract_text() would re-read the xref table for every chunk.
+        self.file = path.open("rb")
+        try:
+            self.pages = list(PDFPage.create_pages(PDFDocument(PDFParser(self.file))))
+        except Exception:
+            self.file.close()
+            raise
+        self.page_count = len(self.pages)
+        self.rsrcmgr = PDFResourceManager(caching=True)
+        self.laparams = LAParams()
+
+    def extract_pages(self, start: int, end: int) -> list[str]:
+        from pdfminer.converter import TextConverter  # type: ignore
+        from pdfminer.pdfinterp import PDFPageInterpreter  # type: ignore
+
+        out: list[str] = []
+        for page in self.pages[start:end]:
+            buf = io.StringIO()
+            try:
+                device = TextConverter(self.rsrcmgr, buf, laparams=self.laparams)
+                PDFPageInterpreter(self.rsrcmgr, device).process_page(page)
+            except Exception:
+                out.append("")
+                continue
+            # Same text as extract_text(), which ends every page with a form feed.
+            out.append(buf.getvalue().removesuffix("\x0c"))
+        return out
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class PdfminerBackend(PdfBackend):
+    name = "pdfminer"
+
+    def available(self) -> bool:
+        try:
+            import pdfminer.high_level  # type: ignore  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    def open(self, path: Path) -> PdfDocument:
+        return _PdfminerDocument(path)
+
+
+class _PdftotextDocument(PdfDocument):
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        info = subprocess.run(["pdfinfo", str(path)], capture_output=True, text=True, errors="replace", check=True)
+        m = re.search(r"^Pages:\s+(\d+)", info.stdout, flags=re.MULTILINE)
+        if not m:
+            raise ValueError("pdfinfo: page count not found")
+        self.page_count = int(m.group(1))
+
+    def extract_pages(self, start: int, end: int) -> list[str]:
+        cmd = ["pdftotext", "-q", "-enc", "UTF-8", "-f", str(start + 1), "-l", str(end), str(self.path), "-"]
+        proc = subprocess.run(cmd, capture_output=True)
+        if proc.returncode != 0:
+            return [""] * (end - start)
+        return _split_pages(proc.stdout.decode("utf-8", "replace"), end - start)
+
+
+class PdftotextBackend(PdfBackend):
+    name = "pdftotext"
+
+    def available(self) -> bool:
+        return shutil.which("pdftotext") is not None and shutil.which("pdfinfo") is not None
+
+    def open(self, path: Path) -> PdfDocument:
+        return _PdftotextDocument(path)
+
+
+BACKENDS: dict[str, PdfBackend] = {b.name: b for b in (PypdfBackend(), PdftotextBackend(), PdfminerBackend())}
+
+
+def available_backends() -> list[str]:
+    return [name for name in DEFAULT_ORDER if BACKENDS[name].available()]
+
+
+def rank_benchmark(results: dict) -> list[str]:
+    """Engines ordered fastest first among those with acceptable coverage, then the rest."""
+    engines = {k: v for k, v in (results.get("engines") or {}).items() if k in BACKENDS}
+    if not engines:
+        return []
+    best_coverage = max(float(v.get("coverage", 0.0)) for v in engines.values())
+
+    def key(name: str) -> tuple[int, float]:
+        v = engines[name]
+        acceptable = float(v.get("coverage", 0.0)) >= best_coverage - COVERAGE_TOLERANCE
+        return (0 if acceptable else 1, -float(v.get("pages_per_s", 0.0)))
+
+    return sorted(engines, key=key)
+
+
+def choose_engines(preferred: str, results: dict | None = None) -> list[str]:
+    """Engine order for a run: the primary engine first, then fallbacks.
+
+    `preferred` is a backend name or "auto" (benchmark ranking when results are
+    given, DEFAULT_ORDER otherwise). Only installed backends are returned.
+    """
+    available = available_backends()
+    order: list[str] = []
+    if preferred != "auto":
+        order.append(preferred)
+    elif results:
+        order.extend(rank_benchmark(results))
+    order.extend(DEFAULT_ORDER)
+    return [name for name in dict.fromkeys(order) if name in available]
+
+
+def load_benchmark(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_benchmark(results: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def benchmark(paths: list[Path], *, max_pages: int) -> dict:
+    """Throughput (pages/s) and coverage (share of pages with text) per available backend."""
+    results: dict[str, dict] = {}
+    for name in available_backends():
+        backend = BACKENDS[name]
+        pages = 0
+        non_empty = 0
+        failures = 0
+        elapsed = 0.0
+        for path in paths:
+            t0 = time.perf_counter()
+            try:
+                doc = backend.open(path)
+                n = min(doc.page_count, max_pages)
+                texts = doc.extract_pages(0, n)
+                doc.close()
+            except Exception:
+                failures += 1
+                continue
+            finally:
+                elapsed += time.perf_counter() - t0
+            pages += n
+            non_empty += sum(1 for t in texts if t.strip())
+        results[name] = {
+            "documents": len(paths) - failures,
+            "failures": failures,
+            "pages": pages,
+            "seconds": round(elapsed, 3),
+            "pages_per_s": round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+            "coverage": round(non_empty / pages, 4) if pages else 0.0,
+        }
+    return {"sample": [str(p) for p in paths], "max_pages": max_pages, "engines": results}
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the installed PDF extraction backends on a corpus.")
+    parser.add_argument("input", nargs="?", default="knowledgebase", help="Folder to sample PDFs from")
+    parser.add_argument("--sample", type=int, default=8, help="Number of PDFs (largest first, default: 8)")
+    parser.add_argument("--pages", type=int, default=20, help="Pages extracted per PDF (default: 20)")
+    parser.add_argument("--save", default=None, help="Write results as JSON (read by --pdf-engine auto)")
+    args = parser.parse_args(argv)
+
+    root = Path(args.input)
+    if not root.exists():
+        print(f"Input folder not found: {root}", file=sys.stderr)
+        return 2
+    pdfs = sorted((p for p in root.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf"), key=lambda p: -p.stat().st_size)
+    if not pdfs:
+        print(f"No PDF found in: {root}", file=sys.stderr)
+        return 2
+
+    results = benchmark(pdfs[: max(1, args.sample)], max_pages=max(1, args.pages))
+    for name in rank_benchmark(results) or []:
+        r = results["engines"][name]
+        print(f"{name:10s} {r['pages_per_s']:8.1f} pages/s  coverage={r['coverage']:.1%}  failures={r['failures']}")
+    if args.save:
+        save_benchmark(results, Path(args.save))
+        print(f"Saved {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -2,24 +2,49 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
 import csv
 import hashlib
+import heapq
+import io
 import json
+import marshal
+import multiprocessing
+import multiprocessing.connection as mp_connection
+import os
+import pstats
 import re
+import signal
 import sys
+import time
+import tracemalloc
 import zipfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 try:
-    from pypdf import PdfReader  # type: ignore
-except Exception:  # pragma: no cover
-    PdfReader = None  # type: ignore
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore
 
 import xml.etree.ElementTree as ET
 
+from knowledgebase_shards import INDEX_FILENAME, SHARDS_DIRNAME, ShardWriter, available_compressions
+from pdf_backends import (
+    BACKENDS,
+    DEFAULT_ORDER,
+    PdfDocument,
+    available_backends,
+    benchmark,
+    choose_engines,
+    load_benchmark,
+    save_benchmark,
+)
+
 
 DOCX_NS = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
 DOCX_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
@@ -35,6 +60,11 @@ DEFAULT_IGNORED_BASENAMES = {
 EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.IGNORECASE)
 FR_PHONE_RE = re.compile(r"\b(?:\+33|0)\s*[1-9](?:[\s.\-]*\d{2}){4}\b")
 INTL_PHONE_RE = re.compile(r"\+\d{1,3}[\s.\-]?\d(?:[\s.\-]*\d){6,}")
+# Group 1 = word; anything else matched is a single punctuation/symbol character.
+WORD_OR_SYMBOL_RE = re.compile(r"(\w+)|[^\w\s]", re.UNICODE)
+CHARS_PER_TOKEN = 4
+AUTO_BENCHMARK_DOCS = 4
+AUTO_BENCHMARK_PAGES = 10
 
 
 def slugify(text: str) -> str:
@@ -197,45 +227,111 @@ def docx_to_markdown(docx_path: Path) -> tuple[str, list[str]]:
     return "\n".join(out_lines).strip() + "\n", warnings
 
 
-def pdf_to_markdown_chunks(pdf_path: Path, *, chunk_pages: int) -> tuple[list[tuple[int, int, str]], list[str]]:
+@dataclass
+class PdfChunk:
+    start_page: int
+    end_page: int
+    text: str
+    extract_ms: float
+    engine: str
+
+
+def pdf_to_markdown_chunks(
+    pdf_path: Path, *, chunk_pages: int, engines: list[str]
+) -> tuple[list[PdfChunk], list[str]]:
+    """Extract text in chunks of pages with engines[0], retrying empty pages with the other engines."""
     warnings: list[str] = []
-    if PdfReader is None:
-        return [], ["pypdf-not-installed"]
+    if not engines:
+        return [], ["pdf-no-backend-installed"]
 
+    t0 = time.perf_counter()
     try:
-        reader = PdfReader(str(pdf_path))
+        primary = BACKENDS[engines[0]].open(pdf_path)
     except Exception as e:  # pragma: no cover
-        return [], [f"pdf-open-failed:{e!r}"]
-
-    chunks: list[tuple[int, int, str]] = []
-    total = len(reader.pages)
-    if total == 0:
-        return [], ["pdf-empty"]
+        return [], [f"pdf-open-failed:{engines[0]}:{e!r}"]
+    fallbacks: dict[str, PdfDocument | None] = {}
 
-    for start in range(0, total, max(1, chunk_pages)):
-        end = min(total, start + max(1, chunk_pages))
-        pages_text: list[str] = []
-        for i in range(start, end):
+    def fallback_doc(name: str) -> PdfDocument | None:
+        if name not in fallbacks:
             try:
-                page_text = reader.pages[i].extract_text() or ""
-            except Exception:
-                page_text = ""
-            if not page_text.strip():
-                continue
-            pages_text.append(page_text)
-
-        joined = "\n\n".join(pages_text)
-        joined = joined.replace("\x0c", "\n")
-        # Drop obvious TOC / bookmark noise line-by-line.
-        cleaned_lines = [ln for ln in joined.splitlines() if not should_drop_line(ln)]
-        md = "\n".join(cleaned_lines).strip() + "\n"
-        if not md.strip():
-            warnings.append(f"pdf-chunk-empty:{start+1}-{end}")
-        chunks.append((start + 1, end, md))
+                fallbacks[name] = BACKENDS[name].open(pdf_path)
+            except Exception as e:  # pragma: no cover
+                warnings.append(f"pdf-open-failed:{name}:{e!r}")
+                fallbacks[name] = None
+        return fallbacks[name]
 
+    chunks: list[PdfChunk] = []
+    try:
+        total = primary.page_count
+        if total == 0:
+            return [], ["pdf-empty"]
+
+        for start in range(0, total, max(1, chunk_pages)):
+            end = min(total, start + max(1, chunk_pages))
+            texts = primary.extract_pages(start, end)
+            used = [engines[0]]
+            for name in engines[1:]:
+                missing = [i for i, t in enumerate(texts) if not t.strip()]
+                if not missing:
+                    break
+                doc = fallback_doc(name)
+                if doc is None:
+                    continue
+                lo, hi = start + missing[0], start + missing[-1] + 1
+                retry = doc.extract_pages(lo, hi)
+                recovered = 0
+                for i in missing:
+                    t = retry[start + i - lo]
+                    if t.strip():
+                        texts[i] = t
+                        recovered += 1
+                if recovered:
+                    used.append(name)
+
+            pages_text = [t for t in texts if t.strip()]
+            joined = "\n\n".join(pages_text)
+            joined = joined.replace("\x0c", "\n")
+            # Drop obvious TOC / bookmark noise line-by-line.
+            cleaned_lines = [ln for ln in joined.splitlines() if not should_drop_line(ln)]
+            md = "\n".join(cleaned_lines).strip() + "\n"
+            if not md.strip():
+                warnings.append(f"pdf-chunk-empty:{start+1}-{end}")
+            # Time spent opening the reader is charged to the first chunk.
+            t1 = time.perf_counter()
+            chunks.append(PdfChunk(start + 1, end, md, (t1 - t0) * 1000.0, "+".join(used)))
+            t0 = t1
+    finally:
+        primary.close()
+        for doc in fallbacks.values():
+            if doc is not None:
+                doc.close()
     return chunks, warnings
 
 
+@dataclass
+class TextStats:
+    chars: int
+    words: int
+    tokens: int
+
+
+def text_stats(text: str) -> TextStats:
+    """Count words and approximate LLM tokens in one pass over the text.
+
+    Tokens follow the usual BPE rule of thumb: one token per ~4 characters of a
+    word (at least one), plus one per punctuation or symbol character.
+    """
+    words = 0
+    tokens = 0
+    for m in WORD_OR_SYMBOL_RE.finditer(text):
+        if m.lastindex:
+            words += 1
+            tokens += (m.end() - m.start() + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        else:
+            tokens += 1
+    return TextStats(chars=len(text), words=words, tokens=tokens)
+
+
 def infer_title_from_filename(path: Path) -> str:
     stem = path.stem.replace("_", " ").strip()
     stem = re.sub(r"\s{2,}", " ", stem)
@@ -273,8 +369,79 @@ class ManifestEntry:
     bytes: int
     chars: int
     words: int
+    tokens: int
     created_at: str
     warnings: str
+    pages: int = 0
+    extract_ms: float = 0.0
+    clean_ms: float = 0.0
+    redact_ms: float = 0.0
+    write_ms: float = 0.0
+    peak_mem_kb: int = 0  # resident memory peak above the RSS at the start of this document
+    engine: str = ""
+
+
+@dataclass
+class PreparedChunk:
+    out_path: Path
+    content: str
+    source_type: str
+    pages: int
+    warnings: str
+    timings: dict[str, float]
+    engine: str = ""
+
+
+class StageClock:
+    """Accumulates wall-clock milliseconds per named stage (extract, clean, redact, write)."""
+
+    def __init__(self) -> None:
+        self.ms: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = self.ms.get(name, 0.0) + (time.perf_counter() - t0) * 1000.0
+
+
+def _proc_status_kb(field: str) -> int | None:
+    """A `VmXxx:` value of /proc/self/status in KiB (Linux), None elsewhere."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def peak_rss_kb() -> int:
+    """High-water mark of resident memory since the last reset_peak_rss(), in KiB (0 when unavailable)."""
+    peak = _proc_status_kb("VmHWM")
+    if peak is not None:
+        return peak
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB.
+    return int(peak // 1024) if sys.platform == "darwin" else int(peak)
+
+
+def reset_peak_rss() -> int | None:
+    """Reset the resident-memory high-water mark to the current RSS (Linux); return that RSS in KiB.
+
+    None when the kernel does not support it: peak_rss_kb() is then the process lifetime peak.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        return None
+    return _proc_status_kb("VmRSS")
 
 
 def iter_source_files(root: Path) -> Iterable[Path]:
@@ -304,6 +471,539 @@ def write_text(path: Path, text: str) -> None:
     path.write_text(text, encoding="utf-8")
 
 
+class MarkdownTreeWriter:
+    """Default export: one Markdown file per document or chunk under the output folder."""
+
+    def __init__(self, output_root: Path) -> None:
+        self.output_root = output_root
+
+    def write(self, path: str, chunk_id: str, content: str) -> None:
+        write_text(self.output_root / path, content)
+
+    def close(self) -> None:
+        pass
+
+
+def finish_markdown(md: str, meta: dict, clock: StageClock, *, redact: bool) -> str:
+    with clock.stage("clean"):
+        md = clean_common(md, redact=False)
+    if redact:
+        with clock.stage("redact"):
+            md = redact_pii(md)
+    return yaml_frontmatter(meta) + md
+
+
+@dataclass
+class ConvertJob:
+    src: Path
+    rel: str
+    source_root: Path
+    output_root: Path
+    meta: dict
+    redact: bool
+    chunk_pages: int
+    pdf_engines: list[str]
+
+    def out_path(self, suffix: str = ".md") -> Path:
+        return build_output_path(self.output_root, self.source_root, self.src, suffix=suffix)
+
+
+class Converter(ABC):
+    """One source format. Optional dependencies are imported inside convert(), never at module load."""
+
+    name = ""  # source_type in the manifest
+    extensions: tuple[str, ...] = ()
+    # True when the source is extracted page range by page range (--chunk-pages), False when it is
+    # read as a whole. Only the extraction works per range: the chunks are still collected and
+    # returned together, so the memory of a document grows with its size either way.
+    streams = False
+    # Relative conversion cost per MB of input, used to start expensive files first.
+    cost_per_mb = 1.0
+
+    @abstractmethod
+    def convert(self, job: ConvertJob) -> tuple[list[PreparedChunk], list[str]]:
+        ...
+
+
+class WholeDocumentConverter(Converter):
+    @abstractmethod
+    def extract(self, src: Path) -> tuple[str, list[str]]:
+        ...
+
+    def convert(self, job: ConvertJob) -> tuple[list[PreparedChunk], list[str]]:
+        clock = StageClock()
+        with clock.stage("extract"):
+            md, warns = self.extract(job.src)
+        content = finish_markdown(md, job.meta, clock, redact=job.redact)
+        warnings = ";".join(warns)
+        report_lines = [f"WARN {self.name} {job.rel}: {warnings}"] if warns else []
+        return [PreparedChunk(job.out_path(), content, self.name, 0, warnings, clock.ms)], report_lines
+
+
+class TxtConverter(WholeDocumentConverter):
+    name = "txt"
+    extensions = (".txt",)
+
+    def extract(self, src: Path) -> tuple[str, list[str]]:
+        return normalize_slide_txt_to_md(src.read_text(encoding="utf-8", errors="replace")), []
+
+
+class DocxConverter(WholeDocumentConverter):
+    name = "docx"
+    extensions = (".docx",)
+    cost_per_mb = 4.0
+
+    def extract(self, src: Path) -> tuple[str, list[str]]:
+        return docx_to_markdown(src)
+
+
+class PdfConverter(Converter):
+    name = "pdf"
+    extensions = (".pdf",)
+    streams = True
+    cost_per_mb = 40.0
+
+    def convert(self, job: ConvertJob) -> tuple[list[PreparedChunk], list[str]]:
+        report_lines: list[str] = []
+        chunks, warns = pdf_to_markdown_chunks(job.src, chunk_pages=job.chunk_pages, engines=job.pdf_engines)
+        if warns:
+            report_lines.append(f"WARN pdf {job.rel}: {';'.join(warns)}")
+        if not chunks:
+            report_lines.append(f"SKIP pdf empty: {job.rel}")
+            return [], report_lines
+
+        prepared: list[PreparedChunk] = []
+        for chunk in chunks:
+            clock = StageClock()
+            clock.ms["extract"] = chunk.extract_ms
+            chunk_meta = dict(job.meta)
+            chunk_meta["pages"] = f"{chunk.start_page}-{chunk.end_page}"
+            content = finish_markdown(chunk.text, chunk_meta, clock, redact=job.redact)
+            out_path = job.out_path(f"-p{chunk.start_page:04d}-p{chunk.end_page:04d}.md")
+            pages = chunk.end_page - chunk.start_page + 1
+            prepared.append(PreparedChunk(out_path, content, "pdf", pages, ";".join(warns), clock.ms, chunk.engine))
+        return prepared, report_lines
+
+
+CONVERTERS: dict[str, Converter] = {
+    ext: converter
+    for converter in (TxtConverter(), DocxConverter(), PdfConverter())
+    for ext in converter.extensions
+}
+
+
+def converter_for(path: Path) -> Converter | None:
+    return CONVERTERS.get(path.suffix.lower())
+
+
+def schedule_key(src: Path) -> float:
+    """Sort key that starts the most expensive files first (estimated from size and cost_per_mb)."""
+    converter = converter_for(src)
+    if converter is None:
+        return 0.0
+    return -src.stat().st_size / (1024 * 1024) * converter.cost_per_mb
+
+
+def prepare_source(
+    src: Path,
+    *,
+    source_root: Path,
+    output_root: Path,
+    redact: bool,
+    chunk_pages: int,
+    pdf_engines: list[str],
+    created_at: str,
+) -> tuple[list[PreparedChunk], list[str]]:
+    """Convert one source file to Markdown chunks, without writing anything."""
+    converter = converter_for(src)
+    if converter is None:
+        raise ValueError(f"unsupported source type: {src.suffix.lower()}")
+    rel = safe_relpath(src, source_root)
+    meta = {
+        "title": infer_title_from_filename(src),
+        "source": rel,
+        "category": src.parent.name,
+        "redacted": bool(redact),
+        "generated_at": created_at,
+    }
+    job = ConvertJob(src, rel, source_root, output_root, meta, redact, chunk_pages, pdf_engines)
+    return converter.convert(job)
+
+
+def record_chunk(
+    chunk: PreparedChunk,
+    *,
+    title: str,
+    source_path: str,
+    output_root: Path,
+    redacted: bool,
+    created_at: str,
+    writer: MarkdownTreeWriter | ShardWriter | None,
+) -> ManifestEntry:
+    clock = StageClock()
+    clock.ms.update(chunk.timings)
+    b = chunk.content.encode("utf-8")
+    digest = sha256_bytes(b)
+    stats = text_stats(chunk.content)
+    output_path = chunk.out_path.relative_to(output_root).as_posix()
+    if writer is not None:
+        with clock.stage("write"):
+            writer.write(output_path, digest[:16], chunk.content)
+    return ManifestEntry(
+        id=digest[:16],
+        title=title,
+        source_path=source_path,
+        output_path=output_path,
+        source_type=chunk.source_type,
+        output_type="md",
+        redacted=redacted,
+        sha256=digest,
+        bytes=len(b),
+        chars=stats.chars,
+        words=stats.words,
+        tokens=stats.tokens,
+        created_at=created_at,
+        warnings=chunk.warnings,
+        pages=chunk.pages,
+        extract_ms=round(clock.ms.get("extract", 0.0), 1),
+        clean_ms=round(clock.ms.get("clean", 0.0), 1),
+        redact_ms=round(clock.ms.get("redact", 0.0), 1),
+        write_ms=round(clock.ms.get("write", 0.0), 1),
+        engine=chunk.engine,
+    )
+
+
+def cost_line(source_path: str, total_ms: float, entries: list[ManifestEntry], mem_kb: int) -> str:
+    stages = " ".join(
+        f"{stage}={sum(getattr(e, f'{stage}_ms') for e in entries):.1f}ms"
+        for stage in ("extract", "clean", "redact", "write")
+    )
+    pages = sum(e.pages for e in entries)
+    return f"COST {total_ms:.1f}ms pages={pages} chunks={len(entries)} {stages} mem=+{mem_kb}KB {source_path}"
+
+
+def dump_profiles(profiles: list[tuple[float, str, int, dict]], profile_dir: Path) -> None:
+    """Write pstats-compatible `.prof` files (snakeviz, flameprof, gprof2dot) plus a text summary."""
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    for rank, (elapsed_ms, source_path, heap_kb, stats) in enumerate(sorted(profiles, reverse=True), start=1):
+        base = profile_dir / f"{rank:02d}-{slugify(source_path)}"
+        prof_path = base.with_suffix(".prof")
+        with prof_path.open("wb") as f:
+            marshal.dump(stats, f)
+        out = io.StringIO()
+        out.write(f"# {source_path} ({elapsed_ms:.1f}ms, Python heap peak {heap_kb}KB)\n")
+        pstats.Stats(str(prof_path), stream=out).sort_stats("cumulative").print_stats(30)
+        base.with_suffix(".txt").write_text(out.getvalue(), encoding="utf-8")
+
+
+@dataclass
+class DocumentResult:
+    status: str  # ok | timeout | oom | error
+    chunks: list[PreparedChunk]
+    notes: list[str]
+    elapsed_ms: float
+    mem_kb: int = 0
+    profile_stats: dict | None = None
+    detail: str = ""
+    heap_kb: int = 0
+
+
+def convert_document(src: Path, options: dict, *, profile: bool) -> DocumentResult:
+    """Run prepare_source() on one file and measure it (same code in-process or in a worker)."""
+    profiler = cProfile.Profile() if profile else None
+    # Python heap peak for the profile traces; tracemalloc slows conversion, so never outside --profile.
+    started_tracing = profile and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if profile:
+        tracemalloc.reset_peak()
+    rss_before = reset_peak_rss()
+    if rss_before is None:
+        rss_before = peak_rss_kb()
+    t0 = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        chunks, notes = prepare_source(src, **options)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        heap_kb = tracemalloc.get_traced_memory()[1] // 1024 if profile else 0
+        if started_tracing:
+            tracemalloc.stop()
+    stats = None
+    if profiler is not None:
+        profiler.create_stats()
+        stats = profiler.stats
+    mem_kb = max(0, peak_rss_kb() - rss_before)
+    return DocumentResult("ok", chunks, notes, elapsed_ms, mem_kb, stats, heap_kb=heap_kb)
+
+
+def limit_address_space(max_bytes: int) -> None:
+    """Cap this process's address space, never above the hard limit it inherited (ulimit -v, container)."""
+    if not max_bytes or resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        max_bytes = min(max_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (max_bytes, hard))
+
+
+def _worker_main(conn, options: dict, max_memory_bytes: int, profile: bool) -> None:
+    """Convert the sources received on `conn` one at a time until the supervisor sends None."""
+    if hasattr(os, "setpgid"):
+        # Own process group, so that a kill also reaches the tools a backend started (pdftotext).
+        os.setpgid(0, 0)
+    try:
+        limit_address_space(max_memory_bytes)
+        limit_error = ""
+    except (OSError, ValueError) as e:
+        limit_error = repr(e)
+    while True:
+        try:
+            src = conn.recv()
+        except EOFError:
+            break
+        if src is None:
+            break
+        t0 = time.perf_counter()
+        try:
+            if limit_error:
+                raise RuntimeError(f"cannot limit memory: {limit_error}")
+            result = convert_document(src, options, profile=profile)
+        except MemoryError:
+            result = DocumentResult("oom", [], [], (time.perf_counter() - t0) * 1000.0, detail="MemoryError")
+        except Exception as e:
+            result = DocumentResult("error", [], [], (time.perf_counter() - t0) * 1000.0, detail=repr(e))
+        conn.send(result)
+    conn.close()
+
+
+class _Worker:
+    """A long-lived worker process; replaced only after it is killed or dies."""
+
+    def __init__(self, ctx, options: dict, max_memory_bytes: int, profile: bool) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child_conn, options, max_memory_bytes, profile), daemon=True)
+        self.proc.start()
+        child_conn.close()
+        if hasattr(os, "setpgid"):
+            try:
+                # Also set from here (the worker does it too), so that kill() never races the worker start.
+                os.setpgid(self.proc.pid, self.proc.pid)
+            except OSError:
+                pass
+        self.idx: int | None = None
+        self.started = 0.0
+
+    def submit(self, idx: int, src: Path) -> None:
+        self.conn.send(src)
+        self.idx = idx
+        self.started = time.monotonic()
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        if self.idx is None and self.proc.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.kill()
+        else:
+            self.proc.join()
+            self.conn.close()
+
+
+def run_supervised(
+    sources: list[Path],
+    options: dict,
+    *,
+    jobs: int,
+    timeout_s: float,
+    max_memory_mb: int,
+    profile: bool,
+) -> Iterator[tuple[Path, DocumentResult]]:
+    """Convert the sources in a pool of worker processes; yield results in input order.
+
+    With several jobs the sources are started by decreasing estimated cost (see
+    Converter.cost_per_mb); results are still yielded in input order.
+
+    Workers run with an address-space limit (RLIMIT_AS) and are killed with their
+    process group once a document exceeds the wall-clock timeout, so one
+    pathological file cannot stall the run. Workers are reused across documents
+    and only replaced after such a kill, an out-of-memory error or a crash.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    max_memory_bytes = max(0, max_memory_mb) * 1024 * 1024
+    # Popped from the end: input order with one worker, most expensive first with several
+    # so that long conversions overlap instead of trailing at the end of the run.
+    pending = list(enumerate(sources))[::-1]
+    if jobs > 1:
+        pending.sort(key=lambda item: (schedule_key(item[1]), item[0]), reverse=True)
+    workers: list[_Worker] = []
+    done: dict[int, DocumentResult] = {}
+    next_out = 0
+
+    try:
+        while pending or any(w.idx is not None for w in workers):
+            idle = [w for w in workers if w.idx is None]
+            while pending and len(workers) < min(max(1, jobs), len(sources)):
+                workers.append(_Worker(ctx, options, max_memory_bytes, profile))
+                idle.append(workers[-1])
+            for worker in idle:
+                if not pending:
+                    break
+                worker.submit(*pending.pop())
+
+            busy = [w for w in workers if w.idx is not None]
+            wait_s = None
+            if timeout_s > 0:
+                wait_s = max(0.0, min(w.started for w in busy) + timeout_s - time.monotonic())
+            mp_connection.wait([w.conn for w in busy], timeout=wait_s)
+
+            for worker in busy:
+                elapsed_ms = (time.monotonic() - worker.started) * 1000.0
+                result = None
+                retire = False
+                if worker.conn.poll():
+                    try:
+                        result = worker.conn.recv()
+                        retire = result.status == "oom"
+                    except EOFError:
+                        # Worker died without reporting: SIGKILL here means the kernel OOM killer.
+                        worker.proc.join()
+                        status = "oom" if worker.proc.exitcode == -signal.SIGKILL else "error"
+                        detail = f"worker exit code {worker.proc.exitcode}"
+                        result = DocumentResult(status, [], [], elapsed_ms, detail=detail)
+                        retire = True
+                elif timeout_s > 0 and elapsed_ms >= timeout_s * 1000.0:
+                    worker.kill()
+                    result = DocumentResult("timeout", [], [], elapsed_ms, detail=f"killed after {timeout_s:g}s")
+                    retire = True
+                if result is None:
+                    continue
+                done[worker.idx] = result
+                worker.idx = None
+                if retire:
+                    worker.close()
+                    workers.remove(worker)
+
+            while next_out in done:
+                yield sources[next_out], done.pop(next_out)
+                next_out += 1
+    finally:
+        for worker in workers:
+            worker.close()
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m or int(m.group(2)) < 1 or int(m.group(1)) >= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 0 <= i < N, got {spec!r}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def shard_of(rel: str, count: int) -> int:
+    """Stable partition of a source path (independent of machine, run and file order)."""
+    return int(hashlib.sha256(rel.encode("utf-8")).hexdigest()[:16], 16) % count
+
+
+def source_order_key(rel: str) -> list[str]:
+    # Same order as sorted(Path) over the source tree, so merged output matches a single-node run.
+    return rel.split("/")
+
+
+def part_name(index: int, count: int) -> str:
+    return f"part-{index:03d}-of-{count:03d}"
+
+
+def report_text(report_items: list[tuple[str, str]], doc_costs: list[tuple[float, str]]) -> str:
+    lines = [line for _, line in report_items]
+    if doc_costs:
+        lines.append("")
+        lines.append("# Documents by cost (slowest first)")
+        lines.extend(line for _, line in sorted(doc_costs, key=lambda c: c[0], reverse=True))
+    return "\n".join(lines).strip() + ("\n" if lines else "")
+
+
+def write_outputs(output_root: Path, header: dict, manifest: list[ManifestEntry], report: str) -> None:
+    output_root.mkdir(parents=True, exist_ok=True)
+    manifest_json = {**header, "documents": [asdict(m) for m in manifest]}
+    (output_root / "manifest.json").write_text(
+        json.dumps(manifest_json, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+
+    with (output_root / "manifest.csv").open("w", newline="", encoding="utf-8") as f:
+        fieldnames = list(asdict(manifest[0]).keys()) if manifest else ["id"]
+        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w.writeheader()
+        for m in manifest:
+            w.writerow(asdict(m))
+
+    (output_root / "report.txt").write_text(report, encoding="utf-8")
+
+
+def merge_partials(output_root: Path) -> int:
+    """Combine the manifest.part-*.json files written by --shard runs into the final outputs."""
+    parts = sorted(output_root.glob("manifest.part-*-of-*.json"))
+    if not parts:
+        print(f"No partial manifest found in: {output_root}", file=sys.stderr)
+        return 2
+    partials = [json.loads(p.read_text(encoding="utf-8")) for p in parts]
+    count = int(partials[0]["shard"]["count"])
+    seen = sorted(int(pm["shard"]["index"]) for pm in partials if int(pm["shard"]["count"]) == count)
+    if len(partials) != count or seen != list(range(count)):
+        print(f"Expected {count} partial manifests (0..{count - 1}), found shards {seen}", file=sys.stderr)
+        return 2
+    header = {k: v for k, v in partials[0].items() if k not in {"shard", "documents", "report", "costs"}}
+    for pm in partials[1:]:
+        for key in ("generated_at", "redacted", "format"):
+            if pm.get(key) != header.get(key):
+                print(f"Partial manifests disagree on {key}: {pm.get(key)!r} != {header.get(key)!r}", file=sys.stderr)
+                return 2
+    # A shard without PDFs records no engine; only the shards that converted PDFs must agree.
+    engines = [pm["pdf_engines"] for pm in partials if pm.get("pdf_engines")]
+    for other in engines[1:]:
+        if other != engines[0]:
+            print(f"Partial manifests disagree on pdf_engines: {other!r} != {engines[0]!r}", file=sys.stderr)
+            return 2
+    header["pdf_engines"] = engines[0] if engines else []
+
+    entries = [ManifestEntry(**d) for pm in partials for d in pm["documents"]]
+    entries.sort(key=lambda e: source_order_key(e.source_path))
+    report_items = [(rel, line) for pm in partials for rel, line in pm["report"]]
+    report_items.sort(key=lambda item: source_order_key(item[0]))
+    doc_costs = [(float(ms), line) for pm in partials for ms, line in pm["costs"]]
+    write_outputs(output_root, header, entries, report_text(report_items, doc_costs))
+
+    if header.get("format") == "shards":
+        index_parts = sorted((output_root / SHARDS_DIRNAME).glob("index.part-*-of-*.json"))
+        indexes = [json.loads(p.read_text(encoding="utf-8")) for p in index_parts]
+        merged_index = {
+            "version": 1,
+            "compression": indexes[0]["compression"] if indexes else "gzip",
+            "shards": [s for idx in indexes for s in idx["shards"]],
+            "records": [r for idx in indexes for r in idx["records"]],
+        }
+        (output_root / SHARDS_DIRNAME / INDEX_FILENAME).write_text(
+            json.dumps(merged_index, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+
+    print(f"Merged {len(parts)} partial manifests: {len(entries)} documents in {output_root}")
+    return 0
+
+
 def main(argv: list[str]) -> int:
     parser = argparse.ArgumentParser(description="Prepare a clean knowledge base export (Markdown + manifest).")
     parser.add_argument("--input", default="knowledgebase", help="Input folder (default: knowledgebase)")
@@ -311,157 +1011,237 @@ def main(argv: list[str]) -> int:
     parser.add_argument("--redact-pii", action="store_true", default=True, help="Redact emails/phones (default: on)")
     parser.add_argument("--no-redact-pii", action="store_false", dest="redact_pii", help="Disable PII redaction")
     parser.add_argument("--chunk-pages", type=int, default=40, help="PDF chunk size in pages (default: 40)")
+    parser.add_argument(
+        "--pdf-engine",
+        choices=["auto", *DEFAULT_ORDER],
+        default="auto",
+        help="Primary PDF text engine; others serve as per-page fallbacks (default: auto = benchmarked)",
+    )
+    parser.add_argument(
+        "--pdf-benchmark",
+        default=None,
+        help="Engine benchmark results used by --pdf-engine auto (default: <output>/pdf_engines.json)",
+    )
     parser.add_argument("--dry-run", action="store_true", help="Do not write files")
+    parser.add_argument(
+        "--format",
+        choices=["md", "shards"],
+        default="md",
+        help="md = one Markdown file per chunk, shards = compressed JSONL shards + index (default: md)",
+    )
+    parser.add_argument("--shard-size-mb", type=float, default=32, help="Max compressed shard size (default: 32)")
+    parser.add_argument(
+        "--compression",
+        choices=["gzip", "zstd"],
+        default="gzip",
+        help="Shard compression; zstd needs the zstandard package (default: gzip)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=int,
+        default=0,
+        metavar="N",
+        help="cProfile every document and keep traces of the N slowest in <output>/_profile (default: off)",
+    )
+    parser.add_argument("--jobs", type=int, default=1, help="Documents converted in parallel (default: 1)")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=900,
+        help="Wall-clock limit per document in seconds, 0 = none (default: 900)",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=int,
+        default=4096,
+        help="Address-space limit per document worker, 0 = none (default: 4096)",
+    )
+    parser.add_argument(
+        "--no-isolate",
+        action="store_false",
+        dest="isolate",
+        help="Convert in this process instead of supervised workers (no timeout / memory cap)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="i/N",
+        help="Only process sources whose path hash falls in partition i of N (0-based) and write a partial manifest",
+    )
+    parser.add_argument("--merge", action="store_true", help="Merge the partial manifests of N --shard runs and exit")
+    parser.add_argument(
+        "--generated-at",
+        default=None,
+        help="Timestamp written in outputs (default: now); required with --shard so every node agrees",
+    )
     args = parser.parse_args(argv)
 
     source_root = Path(args.input).resolve()
     output_root = Path(args.output).resolve()
+    if args.merge:
+        return merge_partials(output_root)
+    if args.shard is not None and not args.generated_at:
+        print("--shard requires --generated-at (the same value on every node)", file=sys.stderr)
+        return 2
+    benchmark_path = Path(args.pdf_benchmark) if args.pdf_benchmark else output_root / "pdf_engines.json"
+    # Every node must pick the same engine: shard runs never benchmark on their own.
+    if args.shard is not None and args.pdf_engine == "auto" and load_benchmark(benchmark_path) is None:
+        print(
+            f"--shard with --pdf-engine auto requires a readable benchmark file ({benchmark_path}); "
+            "run `pdf_backends.py --save` first or pass an explicit --pdf-engine",
+            file=sys.stderr,
+        )
+        return 2
     if not source_root.exists():
         print(f"Input folder not found: {source_root}", file=sys.stderr)
         return 2
+    if args.format == "shards" and args.compression not in available_compressions():
+        print(f"Compression not available: {args.compression} (pip install zstandard)", file=sys.stderr)
+        return 2
 
-    created_at = datetime.now(timezone.utc).isoformat()
-    manifest: list[ManifestEntry] = []
-    report_lines: list[str] = []
+    sources = sorted(iter_source_files(source_root))
+    if args.shard is not None:
+        shard_index, shard_count = args.shard
+        sources = [src for src in sources if shard_of(safe_relpath(src, source_root), shard_count) == shard_index]
+    convertible = [src for src in sources if converter_for(src) is not None]
+    pdfs = sorted((p for p in convertible if converter_for(p).name == "pdf"), key=lambda p: -p.stat().st_size)
+    # Probing the PDF engines imports them: only do it when there is a PDF to convert.
+    pdf_engines: list[str] = []
+    if pdfs:
+        bench = None
+        if args.pdf_engine == "auto":
+            # Pick the fastest acceptable engine from saved results, or benchmark a few PDFs now.
+            bench = load_benchmark(benchmark_path)
+            if bench is None and len(available_backends()) > 1:
+                bench = benchmark(pdfs[:AUTO_BENCHMARK_DOCS], max_pages=AUTO_BENCHMARK_PAGES)
+                if not args.dry_run:
+                    save_benchmark(bench, benchmark_path)
+        pdf_engines = choose_engines(args.pdf_engine, bench)
 
-    for src in sorted(iter_source_files(source_root)):
-        ext = src.suffix.lower()
-        if ext not in {".txt", ".docx", ".pdf"}:
-            report_lines.append(f"SKIP unsupported: {safe_relpath(src, source_root)}")
-            continue
+    writer: MarkdownTreeWriter | ShardWriter | None = None
+    if not args.dry_run:
+        if args.format == "shards":
+            part = part_name(*args.shard) if args.shard is not None else ""
+            writer = ShardWriter(
+                output_root,
+                max_bytes=int(args.shard_size_mb * 1024 * 1024),
+                compression=args.compression,
+                prefix=f"{part}-shard" if part else "shard",
+                index_name=f"index.{part}.json" if part else INDEX_FILENAME,
+            )
+        else:
+            writer = MarkdownTreeWriter(output_root)
 
-        title = infer_title_from_filename(src)
-        category = src.parent.name
-        common_meta = {
-            "title": title,
-            "source": safe_relpath(src, source_root),
-            "category": category,
-            "redacted": bool(args.redact_pii),
-            "generated_at": created_at,
-        }
+    created_at = args.generated_at or datetime.now(timezone.utc).isoformat()
+    manifest: list[ManifestEntry] = []
+    report_items: list[tuple[str, str]] = []
+    doc_costs: list[tuple[float, str]] = []
+    profiles: list[tuple[float, str, int, dict]] = []
+    failed = 0
+
+    options = {
+        "source_root": source_root,
+        "output_root": output_root,
+        "redact": args.redact_pii,
+        "chunk_pages": args.chunk_pages,
+        "pdf_engines": pdf_engines,
+        "created_at": created_at,
+    }
+    if args.isolate:
+        results = run_supervised(
+            convertible,
+            options,
+            jobs=args.jobs,
+            timeout_s=args.timeout,
+            max_memory_mb=args.max_memory_mb,
+            profile=args.profile > 0,
+        )
+    else:
+        results = ((src, convert_document(src, options, profile=args.profile > 0)) for src in convertible)
 
-        if ext == ".txt":
-            raw = src.read_text(encoding="utf-8", errors="replace")
-            md = normalize_slide_txt_to_md(raw)
-            md = clean_common(md, redact=args.redact_pii)
-            out_path = build_output_path(output_root, source_root, src, suffix=".md")
-            content = yaml_frontmatter(common_meta) + md
-            warnings = ""
-            if not args.dry_run:
-                write_text(out_path, content)
-            b = content.encode("utf-8")
-            manifest.append(
-                ManifestEntry(
-                    id=sha256_bytes(b)[:16],
-                    title=title,
-                    source_path=safe_relpath(src, source_root),
-                    output_path=out_path.relative_to(output_root).as_posix(),
-                    source_type="txt",
-                    output_type="md",
-                    redacted=bool(args.redact_pii),
-                    sha256=sha256_bytes(b),
-                    bytes=len(b),
-                    chars=len(content),
-                    words=len(re.findall(r"\\w+", content, flags=re.UNICODE)),
-                    created_at=created_at,
-                    warnings=warnings,
-                )
-            )
-            continue
+    try:
+        for src in sources:
+            rel = safe_relpath(src, source_root)
+            if converter_for(src) is None:
+                report_items.append((rel, f"SKIP unsupported: {rel}"))
+                continue
 
-        if ext == ".docx":
-            md, warns = docx_to_markdown(src)
-            md = clean_common(md, redact=args.redact_pii)
-            out_path = build_output_path(output_root, source_root, src, suffix=".md")
-            content = yaml_frontmatter(common_meta) + md
-            warnings = ";".join(warns)
-            if not args.dry_run:
-                write_text(out_path, content)
-            b = content.encode("utf-8")
-            manifest.append(
-                ManifestEntry(
-                    id=sha256_bytes(b)[:16],
-                    title=title,
-                    source_path=safe_relpath(src, source_root),
-                    output_path=out_path.relative_to(output_root).as_posix(),
-                    source_type="docx",
-                    output_type="md",
-                    redacted=bool(args.redact_pii),
-                    sha256=sha256_bytes(b),
-                    bytes=len(b),
-                    chars=len(content),
-                    words=len(re.findall(r"\\w+", content, flags=re.UNICODE)),
-                    created_at=created_at,
-                    warnings=warnings,
+            _, result = next(results)
+            report_items.extend((rel, note) for note in result.notes)
+            if result.status != "ok":
+                failed += 1
+                report_items.append((rel, f"WARN {result.status} {rel}: {result.detail}"))
+                doc_costs.append(
+                    (result.elapsed_ms, f"COST {result.elapsed_ms:.1f}ms {result.status.upper()} {rel}")
                 )
-            )
-            if warns:
-                report_lines.append(f"WARN docx {safe_relpath(src, source_root)}: {warnings}")
-            continue
-
-        if ext == ".pdf":
-            chunks, warns = pdf_to_markdown_chunks(src, chunk_pages=args.chunk_pages)
-            if warns:
-                report_lines.append(f"WARN pdf {safe_relpath(src, source_root)}: {';'.join(warns)}")
-            if not chunks:
-                report_lines.append(f"SKIP pdf empty: {safe_relpath(src, source_root)}")
                 continue
 
-            for start_page, end_page, md in chunks:
-                chunk_meta = dict(common_meta)
-                chunk_meta["pages"] = f"{start_page}-{end_page}"
-                md = clean_common(md, redact=args.redact_pii)
-                out_path = build_output_path(output_root, source_root, src, suffix=f"-p{start_page:04d}-p{end_page:04d}.md")
-                content = yaml_frontmatter(chunk_meta) + md
-                warnings = ";".join(warns)
-                if not args.dry_run:
-                    write_text(out_path, content)
-                b = content.encode("utf-8")
-                manifest.append(
-                    ManifestEntry(
-                        id=sha256_bytes(b)[:16],
-                        title=title,
-                        source_path=safe_relpath(src, source_root),
-                        output_path=out_path.relative_to(output_root).as_posix(),
-                        source_type="pdf",
-                        output_type="md",
-                        redacted=bool(args.redact_pii),
-                        sha256=sha256_bytes(b),
-                        bytes=len(b),
-                        chars=len(content),
-                        words=len(re.findall(r"\\w+", content, flags=re.UNICODE)),
-                        created_at=created_at,
-                        warnings=warnings,
-                    )
+            entries = [
+                record_chunk(
+                    chunk,
+                    title=infer_title_from_filename(src),
+                    source_path=rel,
+                    output_root=output_root,
+                    redacted=bool(args.redact_pii),
+                    created_at=created_at,
+                    writer=writer,
                 )
-            continue
+                for chunk in result.chunks
+            ]
+            for entry in entries:
+                entry.peak_mem_kb = result.mem_kb
+            manifest.extend(entries)
+            total_ms = result.elapsed_ms + sum(e.write_ms for e in entries)
+            doc_costs.append((total_ms, cost_line(rel, total_ms, entries, result.mem_kb)))
+
+            if result.profile_stats is not None:
+                heapq.heappush(profiles, (total_ms, rel, result.heap_kb, result.profile_stats))
+                if len(profiles) > args.profile:
+                    heapq.heappop(profiles)
+    finally:
+        # Stops the worker processes when the loop is interrupted.
+        results.close()
+
+    if writer is not None:
+        writer.close()
 
     if not args.dry_run:
-        output_root.mkdir(parents=True, exist_ok=True)
-        manifest_path = output_root / "manifest.json"
-        manifest_csv_path = output_root / "manifest.csv"
-        report_path = output_root / "report.txt"
-
-        manifest_json = {
+        header = {
             "generated_at": created_at,
             "source_root": str(source_root),
             "output_root": str(output_root),
             "redacted": bool(args.redact_pii),
-            "documents": [asdict(m) for m in manifest],
+            "format": args.format,
+            "pdf_engines": pdf_engines,
         }
-        manifest_path.write_text(json.dumps(manifest_json, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-
-        with manifest_csv_path.open("w", newline="", encoding="utf-8") as f:
-            fieldnames = list(asdict(manifest[0]).keys()) if manifest else ["id"]
-            w = csv.DictWriter(f, fieldnames=fieldnames)
-            w.writeheader()
-            for m in manifest:
-                w.writerow(asdict(m))
-
-        report = "\n".join(report_lines).strip() + ("\n" if report_lines else "")
-        report_path.write_text(report, encoding="utf-8")
-
-    print(f"Prepared {len(manifest)} documents in {output_root}")
+        if args.shard is not None:
+            partial = {
+                **header,
+                "shard": {"index": args.shard[0], "count": args.shard[1]},
+                "documents": [asdict(m) for m in manifest],
+                "report": report_items,
+                "costs": doc_costs,
+            }
+            output_root.mkdir(parents=True, exist_ok=True)
+            (output_root / f"manifest.{part_name(*args.shard)}.json").write_text(
+                json.dumps(partial, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+            )
+        else:
+            write_outputs(output_root, header, manifest, report_text(report_items, doc_costs))
+
+        if profiles:
+            profile_dir = output_root / "_profile"
+            if args.shard is not None:
+                profile_dir = profile_dir / part_name(*args.shard)
+            dump_profiles(profiles, profile_dir)
+
+    total_words = sum(m.words for m in manifest)
+    total_tokens = sum(m.tokens for m in manifest)
+    print(f"Prepared {len(manifest)} documents in {output_root} ({total_words} words, ~{total_tokens} tokens)")
+    if failed:
+        print(f"{failed} source(s) failed (timeout / oom / error), see report.txt", file=sys.stderr)
+        return 1
     return 0
 
 
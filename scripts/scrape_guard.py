@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Détection du blocage Amazon pour les scripts de couvertures.
+
+Quand Amazon renvoie une page captcha / « robot check », un 503 ou une page
+produit sans image (`data-a-dynamic-image` vide), continuer la liste ne fait
+qu'enchaîner des requêtes lentes et vouées à l'échec. `ScrapeGuard` :
+
+- classe chaque réponse (`classify_response`, `classify_exception`) ;
+- espace les requêtes d'un délai adaptatif par hôte (doublé à chaque blocage,
+  divisé par deux à chaque succès) ;
+- ouvre un disjoncteur par hôte après `threshold` blocages consécutifs : les
+  livres restants passent directement au fallback OpenLibrary, et un seul essai
+  est retenté après `cooldown_s` (délai doublé si l'hôte bloque encore) ;
+- garde les livres bloqués en file pour un prochain passage.
+
+L'état (disjoncteurs + file) est stocké dans `data/.cache/scrape_state.json`.
+
+Usage CLI (afficher l'état) :
+  python3 scripts/scrape_guard.py [data/.cache/scrape_state.json]
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+
+STATE_FILENAME = "scrape_state.json"
+OPENLIBRARY_COVER_URL = "https://covers.openlibrary.org/b/isbn/{isbn}-L.jpg?default=false"
+
+OK = "ok"
+ROBOT = "robot"
+THROTTLED = "throttled"
+EMPTY_IMAGE = "empty_image"
+TIMEOUT = "timeout"
+NETWORK = "network"
+NOT_FOUND = "not_found"
+HTTP_ERROR = "http_error"
+CIRCUIT_OPEN = "circuit_open"
+
+# Réponses qui signalent un blocage de l'hôte plutôt qu'un problème du livre.
+BLOCKING_KINDS = frozenset({ROBOT, THROTTLED, EMPTY_IMAGE, TIMEOUT, NETWORK})
+
+ROBOT_MARKERS = (
+    "/errors/validatecaptcha",
+    "robot check",
+    "api-services-support@amazon",
+    "to discuss automated access to amazon data",
+    "saisissez les caractères que vous voyez",
+    "enter the characters you see below",
+)
+DYNAMIC_IMAGE_RE = re.compile(r'data-a-dynamic-image\s*=\s*"([^"]*)"')
+MAX_COOLDOWN_S = 24 * 3600.0
+
+
+def classify_response(status: int | None, body: str) -> str:
+    text = (body or "").lower()
+    if any(marker in text for marker in ROBOT_MARKERS):
+        return ROBOT
+    if status in (429, 503):
+        return THROTTLED
+    if status == 404:
+        return NOT_FOUND
+    if status is not None and status >= 400:
+        return HTTP_ERROR
+    values = DYNAMIC_IMAGE_RE.findall(body or "")
+    if values and all(html.unescape(v).strip() in ("", "{}") for v in values):
+        return EMPTY_IMAGE
+    return OK
+
+
+def classify_exception(exc: BaseException) -> str:
+    reason = getattr(exc, "reason", None)  # urllib.error.URLError
+    for e in (exc, reason):
+        if isinstance(e, TimeoutError) or "timeout" in type(e).__name__.lower():
+            return TIMEOUT
+    return NETWORK
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+
+@dataclass
+class HostState:
+    delay: float
+    failures: int = 0
+    trips: int = 0
+    open_until: float = 0.0  # epoch, persisté d'un passage à l'autre
+    last_request: float = 0.0  # time.monotonic(), non persisté
+
+
+class ScrapeGuard:
+    def __init__(
+        self,
+        state_path: Path | None = None,
+        *,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        threshold: int = 3,
+        cooldown_s: float = 900.0,
+    ) -> None:
+        self.state_path = state_path
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.threshold = max(1, threshold)
+        self.cooldown_s = cooldown_s
+        self.hosts: dict[str, HostState] = {}
+        self.queue: dict[str, dict] = {}
+        if state_path is not None:
+            self._load(state_path)
+
+    def _load(self, path: Path) -> None:
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        for host, st in (raw.get("hosts") or {}).items():
+            self.hosts[host] = HostState(
+                delay=min(self.max_delay, max(self.base_delay, float(st.get("delay", self.base_delay)))),
+                failures=int(st.get("failures", 0)),
+                trips=int(st.get("trips", 0)),
+                open_until=float(st.get("open_until", 0.0)),
+            )
+        self.queue = dict(raw.get("queue") or {})
+
+    def save(self) -> None:
+        if self.state_path is None:
+            return
+        hosts = {}
+        for host, st in sorted(self.hosts.items()):
+            data = asdict(st)
+            data.pop("last_request")
+            hosts[host] = data
+        payload = {"hosts": hosts, "queue": dict(sorted(self.queue.items()))}
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    def _state(self, url: str) -> HostState:
+        return self.hosts.setdefault(host_of(url), HostState(delay=self.base_delay))
+
+    def allow(self, url: str) -> bool:
+        """False tant que le disjoncteur de l'hôte est ouvert."""
+        return time.time() >= self._state(url).open_until
+
+    def open_until(self, url: str) -> str:
+        ts = self._state(url).open_until
+        return datetime.fromtimestamp(ts).strftime("%H:%M") if ts else ""
+
+    def pace(self, url: str) -> None:
+        """Attend le délai courant de l'hôte depuis sa dernière requête."""
+        st = self._state(url)
+        if st.last_request:
+            wait = st.last_request + st.delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        st.last_request = time.monotonic()
+
+    def record(self, url: str, kind: str) -> bool:
+        """Enregistre le résultat d'une requête ; True si le disjoncteur vient de s'ouvrir."""
+        st = self._state(url)
+        if kind == OK:
+            st.failures = 0
+            st.trips = 0
+            st.open_until = 0.0
+            st.delay = max(self.base_delay, st.delay / 2)
+            return False
+        if kind not in BLOCKING_KINDS:
+            return False
+        st.failures += 1
+        st.delay = min(self.max_delay, max(st.delay, 0.5) * 2)
+        if st.failures < self.threshold:
+            return False
+        st.trips += 1
+        st.open_until = time.time() + min(MAX_COOLDOWN_S, self.cooldown_s * 2 ** (st.trips - 1))
+        return True
+
+    def enqueue(self, key: str, *, title: str, url: str, reason: str) -> None:
+        self.queue[key] = {"titre": title, "url": url, "raison": reason, "date": now_iso()}
+
+    def dequeue(self, key: str) -> None:
+        self.queue.pop(key, None)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Affiche l'état des disjoncteurs et la file des couvertures bloquées.")
+    parser.add_argument("path", nargs="?", default=f"data/.cache/{STATE_FILENAME}")
+    parser.add_argument("--reset", action="store_true", help="Referme les disjoncteurs (garde la file)")
+    args = parser.parse_args(argv)
+
+    path = Path(args.path)
+    guard = ScrapeGuard(path)
+    if args.reset:
+        guard.hosts.clear()
+        guard.save()
+    for host, st in sorted(guard.hosts.items()):
+        state = f"ouvert jusqu'à {guard.open_until('https://' + host)}" if time.time() < st.open_until else "fermé"
+        print(f"{host}: {state}, délai {st.delay:.1f}s, blocages consécutifs {st.failures}")
+    print(f"{len(guard.queue)} livre(s) en file")
+    for key, item in guard.queue.items():
+        print(f"  {key}: {item.get('raison')} ({item.get('date')})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
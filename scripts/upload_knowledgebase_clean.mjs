@@ -1,7 +1,9 @@
 #!/usr/bin/env node
+import { spawn } from "node:child_process";
 import fs from "node:fs";
 import path from "node:path";
-import OpenAI from "openai";
+import { fileURLToPath } from "node:url";
+import OpenAI, { toFile } from "openai";
 
 function walk(dir) {
   const out = [];
@@ -17,6 +19,35 @@ function sleep(ms) {
   return new Promise((r) => setTimeout(r, ms));
 }
 
+// Reads stdout as it is consumed (no buffering of the whole export), one line at a time.
+async function* readLines(stream) {
+  let buffered = "";
+  for await (const chunk of stream) {
+    buffered += chunk;
+    let nl;
+    while ((nl = buffered.indexOf("\n")) >= 0) {
+      yield buffered.slice(0, nl);
+      buffered = buffered.slice(nl + 1);
+    }
+  }
+  if (buffered.trim()) yield buffered;
+}
+
+// --format shards export: batches of {id, path, content} streamed by knowledgebase_shards.py, no temp files.
+async function* shardBatches(root, size) {
+  const script = fileURLToPath(new URL("./knowledgebase_shards.py", import.meta.url));
+  const child = spawn(process.env.PYTHON || "python3", [script, "batches", root, "--size", String(size)], {
+    stdio: ["ignore", "pipe", "inherit"],
+  });
+  const exited = new Promise((resolve) => child.on("close", resolve));
+  child.stdout.setEncoding("utf8");
+  for await (const line of readLines(child.stdout)) {
+    if (line.trim()) yield JSON.parse(line);
+  }
+  const code = await exited;
+  if (code !== 0) throw new Error(`knowledgebase_shards.py exited with code ${code}`);
+}
+
 const inputDir = process.argv[2] || "knowledgebase_clean";
 const apiKey = process.env.OPENAI_API_KEY;
 if (!apiKey) {
@@ -30,8 +61,9 @@ if (!fs.existsSync(inputDir)) {
   process.exit(2);
 }
 
-const mdFiles = walk(inputDir).filter((p) => p.toLowerCase().endsWith(".md"));
-if (mdFiles.length === 0) {
+const sharded = fs.existsSync(path.join(inputDir, "shards", "index.json"));
+const mdFiles = sharded ? [] : walk(inputDir).filter((p) => p.toLowerCase().endsWith(".md"));
+if (!sharded && mdFiles.length === 0) {
   console.error(`No .md files found in: ${inputDir}`);
   process.exit(2);
 }
@@ -39,14 +71,36 @@ if (mdFiles.length === 0) {
 const client = new OpenAI({ apiKey });
 const vectorStoreName = process.env.OPENAI_VECTOR_STORE_NAME || `BAI knowledgebase (${new Date().toISOString()})`;
 
-console.log(`Uploading ${mdFiles.length} files…`);
 const fileIds = [];
-for (const filePath of mdFiles) {
-  const created = await client.files.create({
-    file: fs.createReadStream(filePath),
-    purpose: "assistants",
-  });
-  fileIds.push(created.id);
+if (sharded) {
+  const batchSize = Math.max(1, Number(process.env.OPENAI_UPLOAD_BATCH_SIZE) || 20);
+  console.log(`Uploading chunks from ${path.join(inputDir, "shards")} (${batchSize} at a time)…`);
+  for await (const batch of shardBatches(inputDir, batchSize)) {
+    const created = await Promise.all(
+      batch.map(async (record) =>
+        client.files.create({
+          file: await toFile(Buffer.from(record.content, "utf8"), path.basename(record.path)),
+          purpose: "assistants",
+        })
+      )
+    );
+    fileIds.push(...created.map((f) => f.id));
+    process.stdout.write(`\r${fileIds.length} files`);
+  }
+  process.stdout.write("\n");
+  if (fileIds.length === 0) {
+    console.error(`No chunks found in: ${path.join(inputDir, "shards")}`);
+    process.exit(2);
+  }
+} else {
+  console.log(`Uploading ${mdFiles.length} files…`);
+  for (const filePath of mdFiles) {
+    const created = await client.files.create({
+      file: fs.createReadStream(filePath),
+      purpose: "assistants",
+    });
+    fileIds.push(created.id);
+  }
 }
 
 console.log("Creating vector store…");